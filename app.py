@@ -1,18 +1,75 @@
 # ----------------------------------------
 # IMPORT LIBRARIES
 # ----------------------------------------
-from flask import Flask, render_template, request, session, redirect, url_for, flash, jsonify
+import time
+STARTUP_BEGAN = time.perf_counter()  # start of the startup report (see STARTUP REPORT)
+from flask import Flask, render_template, request, session, redirect, url_for, flash, jsonify, g, make_response, send_file
+from flask import before_render_template, template_rendered
 import numpy as np
-import pickle
+import os
+import sys
 import sqlite3
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import json
+import csv
+import io
+import atexit
+import registry
+import db
+import features
+from chatbot import generate_chatbot_response
+import metrics
+import cache
+import gzip
+import hashlib
+import jobs
+import batching
+import archive
+import passwords
+
+# Seconds spent in each startup phase, printed and exported once the app is ready
+startup_phases = {"imports": time.perf_counter() - STARTUP_BEGAN}
+_startup = {"mark": time.perf_counter(), "first_prediction": None}
+
+def end_startup_phase(name):
+    now = time.perf_counter()
+    startup_phases[name] = now - _startup["mark"]
+    _startup["mark"] = now
 
 # ----------------------------------------
 # LOAD TRAINED MODEL
 # ----------------------------------------
-model = pickle.load(open("model/payments.pkl", "rb"))
+# Serve the newest version in model/registry (published by training.py).
+# FRAUD_MODEL_PATH pins a plain pickle instead; model/payments.pkl is the fallback.
+# Tree ensembles and SVCs are converted to NumPy arrays for fast single-row
+# predictions, and memory-mapped from disk so worker processes share one copy.
+MODEL_PATH = os.environ.get("FRAUD_MODEL_PATH")
+if MODEL_PATH is None and registry.latest_version():
+    active_model = registry.load_version(registry.latest_version())
+else:
+    active_model = registry.load_file(MODEL_PATH or "model/payments.pkl")
+models = registry.ModelHolder(active_model)
+end_startup_phase("model_load")
+registry.warm(active_model)
+end_startup_phase("model_warm")
+
+# Optional polling of the registry for newly published versions (seconds, 0 = off)
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", "0"))
+if MODEL_WATCH_INTERVAL > 0:
+    models.watch(MODEL_WATCH_INTERVAL)
+
+# Token for the /admin endpoints; they are disabled when it is not set
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+# Upper bound on rows accepted by one batch scoring request
+MAX_BATCH_ROWS = 50000
+
+# Fraud scores of recently seen /predict inputs, keyed on model version and
+# the 7 raw features; emptied whenever a new model is swapped in
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", "600"))
+prediction_cache = cache.TTLCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL)
+models.on_swap(lambda active: prediction_cache.clear())
 
 # ----------------------------------------
 # CREATE FLASK APP
@@ -20,6 +77,87 @@ model = pickle.load(open("model/payments.pkl", "rb"))
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here_change_this_in_production_2024'  # Change this to a random secret key
 
+# ----------------------------------------
+# METRICS AND PROFILING
+# ----------------------------------------
+metrics_registry = metrics.MetricsRegistry()
+REQUEST_SECONDS = metrics_registry.histogram(
+    "fraud_request_seconds", "Request latency by route, method and status")
+STAGE_SECONDS = metrics_registry.histogram(
+    "fraud_stage_seconds", "Time spent in each request stage by route")
+metrics_registry.gauge(
+    "fraud_model_info", "Model version currently serving",
+    lambda: [({"version": models.current().version}, 1)])
+metrics_registry.gauge(
+    "fraud_startup_seconds", "Time spent in each startup phase of this process",
+    lambda: [({"phase": phase}, round(seconds, 6)) for phase, seconds in startup_phases.items()])
+metrics_registry.gauge(
+    "fraud_time_to_first_prediction_seconds", "From process start to the first scored transaction",
+    lambda: _startup["first_prediction"])
+PREDICTION_CACHE_REQUESTS = metrics_registry.counter(
+    "fraud_prediction_cache_requests_total", "Prediction cache lookups on /predict by result")
+metrics_registry.gauge(
+    "fraud_prediction_cache_entries", "Scores held in the prediction cache", lambda: len(prediction_cache))
+
+# Opt-in micro-batching of concurrent single-row predictions (see batching.py)
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get("MICRO_BATCH_MAX_WAIT_MS", "0"))
+MICRO_BATCH_MAX_SIZE = int(os.environ.get("MICRO_BATCH_MAX_SIZE", "64"))
+batcher = None
+if MICRO_BATCH_MAX_WAIT_MS > 0:
+    INFERENCE_BATCH_ROWS = metrics_registry.histogram(
+        "fraud_inference_batch_rows", "Rows per micro-batched model call",
+        buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+    INFERENCE_QUEUE_WAIT = metrics_registry.histogram(
+        "fraud_inference_queue_wait_seconds", "Time a prediction waited for its micro-batch",
+        buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1))
+
+    def record_batch(rows, queue_waits):
+        INFERENCE_BATCH_ROWS.observe(rows)
+        for wait in queue_waits:
+            INFERENCE_QUEUE_WAIT.observe(wait)
+
+    batcher = batching.MicroBatcher(MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT_MS / 1000, record_batch)
+
+# Opt-in: write folded stacks for requests slower than PROFILE_SLOW_MS
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "0"))
+profiler = None
+if PROFILE_SLOW_MS > 0:
+    profiler = metrics.SlowRequestProfiler(PROFILE_SLOW_MS / 1000,
+                                           output_dir=os.environ.get("PROFILE_DIR", "profiles"))
+
+def stage(name):
+    # with stage("model_inference"): ... records into fraud_stage_seconds
+    return metrics.timer(STAGE_SECONDS, route=request.endpoint or "unknown", stage=name)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if profiler is not None:
+        profiler.start()
+
+@app.after_request
+def record_request_metrics(response):
+    duration = time.perf_counter() - g.pop('request_start', time.perf_counter())
+    route = request.endpoint or "not_found"
+    REQUEST_SECONDS.observe(duration, route=route, method=request.method, status=response.status_code)
+    if profiler is not None:
+        profiler.stop(route, duration)
+    return response
+
+@before_render_template.connect_via(app)
+def start_render_timer(sender, template, context, **extra):
+    g.render_start = time.perf_counter()
+
+@template_rendered.connect_via(app)
+def record_render_time(sender, template, context, **extra):
+    if 'render_start' in g:
+        STAGE_SECONDS.observe(time.perf_counter() - g.pop('render_start'),
+                              route=request.endpoint or "unknown", stage="render_template")
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return app.response_class(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
 # ----------------------------------------
 # CONTEXT PROCESSOR FOR TEMPLATES
 # ----------------------------------------
@@ -27,11 +165,88 @@ app.secret_key = 'your_secret_key_here_change_this_in_production_2024'  # Change
 def utility_processor():
     return {'now': datetime.now}
 
+# ----------------------------------------
+# RENDERED PAGE CACHE
+# ----------------------------------------
+# Mostly static pages are rendered once per (template, arguments, user) and
+# served from memory until they expire or are evicted. Pages carrying flashed
+# messages are always rendered fresh, since showing them consumes them.
+# ----------------------------------------
+PAGE_CACHE_SIZE = int(os.environ.get("PAGE_CACHE_SIZE", "256"))
+PAGE_CACHE_TTL = float(os.environ.get("PAGE_CACHE_TTL", "300"))
+page_cache = cache.TTLCache(PAGE_CACHE_SIZE, PAGE_CACHE_TTL)
+PAGE_CACHE_REQUESTS = metrics_registry.counter(
+    "fraud_page_cache_requests_total", "Rendered page cache lookups by template and result")
+
+def render_cached(template, **context):
+    if session.get('_flashes'):
+        response = make_response(render_template(template, **context))
+    else:
+        # Templates only read the user's name from the session, so it is part of the key
+        key = (template, tuple(sorted(context.items())), session.get('user'), session.get('full_name'))
+        entry = page_cache.get(key)
+        PAGE_CACHE_REQUESTS.inc(template=template, result="miss" if entry is None else "hit")
+        if entry is None:
+            html = render_template(template, **context)
+            entry = (html, hashlib.sha1(html.encode()).hexdigest())
+            page_cache.set(key, entry)
+        response = make_response(entry[0])
+        response.set_etag(entry[1])
+    # Content depends on the session cookie, so only the browser may keep it, and must revalidate
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+# ----------------------------------------
+# PRECOMPRESSED STATIC ASSETS
+# ----------------------------------------
+# Compressed once at startup; served gzip-encoded to clients that accept it.
+# ----------------------------------------
+STATIC_ASSETS = {
+    "loading.js": ("templates/loading.js", "application/javascript"),
+}
+ASSET_MAX_AGE = int(os.environ.get("ASSET_MAX_AGE", "86400"))
+
+def load_static_assets():
+    assets = {}
+    for name, (path, mimetype) in STATIC_ASSETS.items():
+        with open(os.path.join(app.root_path, path), "rb") as f:
+            body = f.read()
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        digest = hashlib.sha1(body).hexdigest()[:16]
+        assets[name] = {
+            "mimetype": mimetype,
+            "identity": (body, digest),
+            "gzip": (compressed, digest + "-gz") if len(compressed) < len(body) else None,
+        }
+    return assets
+
+static_assets = load_static_assets()
+
+@app.route("/assets/<name>")
+def static_asset(name):
+    asset = static_assets.get(name)
+    if asset is None:
+        return "Not found", 404
+    encoded = asset["gzip"] if asset["gzip"] and "gzip" in request.accept_encodings else None
+    body, etag = encoded or asset["identity"]
+    response = app.response_class(body, mimetype=asset["mimetype"])
+    if encoded:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}"
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
 # ----------------------------------------
 # DATABASE INITIALIZATION WITH MIGRATION
 # ----------------------------------------
-def init_db():
-    conn = sqlite3.connect('users.db')
+# init_db() creates and migrates the schema. It runs once per SCHEMA_VERSION,
+# recorded in the database's user_version, so the workers of a deployment
+# normally skip it with a single PRAGMA read. Bump SCHEMA_VERSION whenever
+# init_db() changes.
+SCHEMA_VERSION = 2
+
+def init_db(conn):
     c = conn.cursor()
     
     # Check if users table exists
@@ -92,8 +307,26 @@ def init_db():
                   newbalanceDest REAL,
                   result TEXT,
                   timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  model_version TEXT,
+                  fraud_score REAL,
                   FOREIGN KEY (user_id) REFERENCES users (id))''')
     
+    # Add model_version / fraud_score to transactions tables created before they existed
+    c.execute("PRAGMA table_info(transactions)")
+    transaction_columns = [column[1] for column in c.fetchall()]
+    if 'model_version' not in transaction_columns:
+        c.execute("ALTER TABLE transactions ADD COLUMN model_version TEXT")
+        print("Added model_version column to transactions table")
+    if 'fraud_score' not in transaction_columns:
+        c.execute("ALTER TABLE transactions ADD COLUMN fraud_score REAL")
+        print("Added fraud_score column to transactions table")
+    
+    # Runtime settings shared by all server processes (e.g. the fraud threshold)
+    c.execute('''CREATE TABLE IF NOT EXISTS app_settings
+                 (key TEXT PRIMARY KEY,
+                  value TEXT,
+                  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    
     # Create chat messages table if not exists
     c.execute('''CREATE TABLE IF NOT EXISTS chat_messages
                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -103,19 +336,200 @@ def init_db():
                   timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                   FOREIGN KEY (user_id) REFERENCES users (id))''')
     
-    conn.commit()
-    conn.close()
-    print("Database initialization complete")
+    # Per-user running totals, updated in the same transaction as each INSERT into transactions
+    c.execute("""SELECT name FROM sqlite_master WHERE type='table' AND name='user_stats'""")
+    stats_exists = c.fetchone()
+    c.execute('''CREATE TABLE IF NOT EXISTS user_stats
+                 (user_id INTEGER PRIMARY KEY,
+                  total_transactions INTEGER NOT NULL DEFAULT 0,
+                  fraud_count INTEGER NOT NULL DEFAULT 0,
+                  total_amount REAL NOT NULL DEFAULT 0,
+                  version INTEGER NOT NULL DEFAULT 0,
+                  FOREIGN KEY (user_id) REFERENCES users (id))''')
+    if not stats_exists:
+        # Backfill from existing transactions
+        c.execute("""INSERT INTO user_stats (user_id, total_transactions, fraud_count, total_amount, version)
+                     SELECT user_id, COUNT(*),
+                            SUM(CASE WHEN result = 'Fraudulent Transaction' THEN 1 ELSE 0 END),
+                            COALESCE(SUM(amount), 0), 1
+                     FROM transactions WHERE user_id IS NOT NULL GROUP BY user_id""")
+        print("Created user_stats table")
+    
+    # Bulk CSV scoring jobs (see jobs.py); progress is updated once per chunk
+    c.execute('''CREATE TABLE IF NOT EXISTS scoring_jobs
+                 (id TEXT PRIMARY KEY,
+                  user_id INTEGER,
+                  filename TEXT,
+                  status TEXT,
+                  rows_total INTEGER,
+                  rows_done INTEGER NOT NULL DEFAULT 0,
+                  fraud_count INTEGER NOT NULL DEFAULT 0,
+                  model_version TEXT,
+                  error TEXT,
+                  created_at REAL,
+                  started_at REAL,
+                  updated_at REAL,
+                  finished_at REAL,
+                  FOREIGN KEY (user_id) REFERENCES users (id))''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_scoring_jobs_user_created ON scoring_jobs (user_id, created_at)")
+    
+    # Parquet files holding archived transactions (see archive.py)
+    c.execute(archive.SCHEMA_SQL)
+    
+    # Indexes for per-user history sorted by time (id is the rowid, so each index
+    # is also ordered by id within a timestamp), optionally filtered by type or result
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_time ON transactions (user_id, timestamp)")
+    c.execute("DROP INDEX IF EXISTS idx_transactions_user_result")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_result_time ON transactions (user_id, result, timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_type_time ON transactions (user_id, type, timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_user_time ON chat_messages (user_id, timestamp)")
+
+def migrate_db():
+    conn = db.connect()
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return False
+        # Workers starting together queue up here; only the first one migrates
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            conn.rollback()
+            return False
+        init_db(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        print(f"Database initialization complete (schema version {SCHEMA_VERSION})")
+        return True
+    finally:
+        conn.close()
 
 # Initialize database
-init_db()
+migrate_db()
+end_startup_phase("db_migrate")
+
+# ----------------------------------------
+# DATABASE CONNECTIONS
+# ----------------------------------------
+# Handlers borrow a pooled WAL-mode connection for the duration of the request
+db_pool = db.ConnectionPool()
+
+def get_db():
+    if 'db' not in g:
+        g.db = db_pool.acquire()
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    db_pool.release(g.pop('db', None))
+
+# Durability of transaction/chat inserts: "sync" commits before responding,
+# "async" hands them to a background writer that commits in batches
+DB_WRITE_MODE = os.environ.get("DB_WRITE_MODE", "sync")
+write_queue = None
+if DB_WRITE_MODE == "async":
+    DB_FLUSH_SECONDS = metrics_registry.histogram(
+        "fraud_db_write_flush_seconds", "Write-behind batch commit latency")
+    DB_FLUSH_ITEMS = metrics_registry.counter(
+        "fraud_db_write_flushed_items_total", "Items committed by the write-behind queue")
+    write_queue = db.WriteBehindQueue(
+        max_size=int(os.environ.get("DB_WRITE_QUEUE_SIZE", "10000")),
+        batch_size=int(os.environ.get("DB_WRITE_BATCH_SIZE", "500")),
+        flush_interval=float(os.environ.get("DB_WRITE_FLUSH_SECONDS", "0.05")),
+        on_flush=lambda items, seconds: (DB_FLUSH_SECONDS.observe(seconds), DB_FLUSH_ITEMS.inc(items))
+    )
+    atexit.register(write_queue.close)
+metrics_registry.gauge(
+    "fraud_db_write_queue_depth", "Items waiting in the write-behind queue",
+    lambda: write_queue.depth() if write_queue is not None else 0)
+
+def persist(statements):
+    # statements: list of (sql, params) that must commit together
+    if write_queue is not None:
+        with stage("db_enqueue"):
+            if write_queue.submit(statements):
+                return
+    # Sync mode, or the queue is full: write in this request
+    with stage("db_write"):
+        conn = get_db()
+        with conn:
+            db.execute_statements(conn, statements)
+
+# ----------------------------------------
+# TRANSACTION ARCHIVE
+# ----------------------------------------
+# Transactions older than ARCHIVE_AFTER_DAYS are moved to monthly Parquet
+# files every ARCHIVE_INTERVAL_SECONDS (see archive.py); 0 keeps them all in
+# users.db. History pages read both stores either way.
+ARCHIVE_AFTER_DAYS = float(os.environ.get("ARCHIVE_AFTER_DAYS", "0"))
+ARCHIVE_INTERVAL_SECONDS = float(os.environ.get("ARCHIVE_INTERVAL_SECONDS", "3600"))
+transaction_archive = archive.TransactionArchive(db_pool)
+if ARCHIVE_AFTER_DAYS > 0:
+    transaction_archive.start(ARCHIVE_AFTER_DAYS, ARCHIVE_INTERVAL_SECONDS)
+
+# ----------------------------------------
+# FRAUD THRESHOLD
+# ----------------------------------------
+# Transactions whose calibrated fraud probability is above the threshold are
+# flagged. Admins can change it at runtime (POST /admin/threshold); it is kept
+# in app_settings so every server process picks it up within
+# THRESHOLD_REFRESH_SECONDS.
+DEFAULT_FRAUD_THRESHOLD = float(os.environ.get("FRAUD_THRESHOLD", "0.5"))
+THRESHOLD_REFRESH_SECONDS = float(os.environ.get("THRESHOLD_REFRESH_SECONDS", "5"))
+_threshold = {"value": DEFAULT_FRAUD_THRESHOLD, "checked_at": None}
+
+def fraud_threshold():
+    now = time.monotonic()
+    checked_at = _threshold["checked_at"]
+    if checked_at is None or now - checked_at > THRESHOLD_REFRESH_SECONDS:
+        conn = db_pool.acquire()
+        try:
+            row = conn.execute("SELECT value FROM app_settings WHERE key = 'fraud_threshold'").fetchone()
+        finally:
+            db_pool.release(conn)
+        _threshold["value"] = float(row[0]) if row else DEFAULT_FRAUD_THRESHOLD
+        _threshold["checked_at"] = now
+    return _threshold["value"]
+
+def set_fraud_threshold(value):
+    conn = db_pool.acquire()
+    try:
+        with conn:
+            conn.execute("""INSERT INTO app_settings (key, value) VALUES ('fraud_threshold', ?)
+                            ON CONFLICT(key) DO UPDATE SET value = excluded.value,
+                                                           updated_at = CURRENT_TIMESTAMP""", (str(value),))
+    finally:
+        db_pool.release(conn)
+    _threshold["value"] = value
+    _threshold["checked_at"] = time.monotonic()
+
+# ----------------------------------------
+# PASSWORD HASHING
+# ----------------------------------------
+# Hashes run in a bounded process pool (see passwords.py), so a burst of
+# logins can't take the CPU that /predict needs; overload is answered with 429
+PASSWORD_HASH_SECONDS = metrics_registry.histogram(
+    "fraud_password_hash_seconds", "Password hash/verify latency including pool queueing",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+PASSWORD_HASH_REJECTED = metrics_registry.counter(
+    "fraud_password_hash_rejected_total", "Logins and registrations refused because the hash pool was full")
+password_hasher = passwords.PasswordHasher(
+    on_hash=lambda operation, seconds: PASSWORD_HASH_SECONDS.observe(seconds, operation=operation))
+atexit.register(password_hasher.close)
+metrics_registry.gauge(
+    "fraud_password_hash_pending", "Password hashes queued or running", password_hasher.pending)
+
+def password_pool_full(template):
+    PASSWORD_HASH_REJECTED.inc()
+    flash("Too many sign-ins right now. Please try again in a moment.", "error")
+    response = make_response(render_template(template), 429)
+    response.headers["Retry-After"] = "1"
+    return response
 
 # ----------------------------------------
 # HOME PAGE
 # ----------------------------------------
 @app.route("/")
 def home():
-    return render_template("home.html")
+    return render_cached("home.html")
 
 # ----------------------------------------
 # REGISTER PAGE
@@ -129,22 +543,25 @@ def register():
         full_name = request.form.get("full_name", "")
         
         # Hash the password
-        hashed_password = generate_password_hash(password)
+        try:
+            with stage("password_hash"):
+                hashed_password = password_hasher.hash(password)
+        except passwords.PasswordPoolFull:
+            return password_pool_full("register.html")
         
         try:
-            conn = sqlite3.connect('users.db')
+            conn = get_db()
             c = conn.cursor()
             c.execute("INSERT INTO users (username, password, email, full_name) VALUES (?, ?, ?, ?)",
                       (username, hashed_password, email, full_name))
             conn.commit()
-            conn.close()
             flash("Registration successful! Please login.", "success")
             return redirect(url_for('login'))
         except sqlite3.IntegrityError:
             flash("Username already exists!", "error")
             return render_template("register.html")
     
-    return render_template("register.html")
+    return render_cached("register.html")
 
 # ----------------------------------------
 # LOGIN PAGE
@@ -155,13 +572,27 @@ def login():
         username = request.form["username"]
         password = request.form["password"]
         
-        conn = sqlite3.connect('users.db')
-        c = conn.cursor()
-        c.execute("SELECT * FROM users WHERE username = ?", (username,))
-        user = c.fetchone()
-        conn.close()
+        with stage("db_read"):
+            conn = get_db()
+            c = conn.cursor()
+            c.execute("SELECT * FROM users WHERE username = ?", (username,))
+            user = c.fetchone()
         
-        if user and check_password_hash(user[2], password):
+        try:
+            with stage("password_check"):
+                password_ok = user is not None and password_hasher.verify(user[2], password)
+        except passwords.PasswordPoolFull:
+            return password_pool_full("login.html")
+        
+        if password_ok:
+            # Hashed with other cost parameters than configured now: upgrade it
+            if password_hasher.needs_rehash(user[2]):
+                try:
+                    conn.execute("UPDATE users SET password = ? WHERE id = ?",
+                                 (password_hasher.hash(password), user[0]))
+                    conn.commit()
+                except passwords.PasswordPoolFull:
+                    pass  # next login will retry
             session['user'] = username
             session['user_id'] = user[0]
             # Handle if full_name doesn't exist yet
@@ -173,7 +604,7 @@ def login():
             flash("Invalid username or password!", "error")
             return render_template("login.html")
     
-    return render_template("login.html")
+    return render_cached("login.html")
 
 # ----------------------------------------
 # LOGOUT
@@ -198,13 +629,12 @@ def profile():
         return redirect(url_for('login'))
     
     try:
-        conn = sqlite3.connect('users.db')
+        conn = get_db()
         c = conn.cursor()
         
         # Get user data
         c.execute("SELECT username, email, full_name, created_at FROM users WHERE id = ?", (session['user_id'],))
         user_data = c.fetchone()
-        conn.close()
         
         # If user_data has None values, provide defaults
         if user_data:
@@ -243,14 +673,13 @@ def update_profile():
         return redirect(url_for('profile'))
     
     try:
-        conn = sqlite3.connect('users.db')
+        conn = get_db()
         c = conn.cursor()
         
         # Update user profile
         c.execute("UPDATE users SET email = ?, full_name = ? WHERE id = ?",
                   (email, full_name, session['user_id']))
         conn.commit()
-        conn.close()
         
         # Update session
         session['full_name'] = full_name
@@ -266,6 +695,56 @@ def update_profile():
 # ----------------------------------------
 # DASHBOARD
 # ----------------------------------------
+USER_STATS_SQL = """SELECT total_transactions, fraud_count, total_amount, version
+                    FROM user_stats WHERE user_id = ?"""
+
+def get_user_stats(c, user_id):
+    # Single primary-key lookup in the incrementally maintained summary table
+    with stage("db_read"):
+        c.execute(USER_STATS_SQL, (user_id,))
+        row = c.fetchone()
+    return tuple(row) if row else (0, 0, 0, 0)
+
+def stats_payload(total_transactions, fraud_count, total_amount):
+    fraud_percentage = (fraud_count / total_transactions * 100) if total_transactions > 0 else 0
+    return {
+        "total_transactions": total_transactions,
+        "fraud_count": fraud_count,
+        "total_amount": f"{total_amount:,.2f}",
+        "fraud_percentage": round(fraud_percentage, 2)
+    }
+
+def stats_etag(user_id, version):
+    # Stats only change when version does, so polls with a matching ETag get an empty 304
+    return f"u{user_id}-v{version}"
+
+INSERT_TRANSACTION_SQL = """INSERT INTO transactions 
+                            (user_id, step, type, amount, oldbalanceOrg, newbalanceOrig, 
+                             oldbalanceDest, newbalanceDest, result, model_version, fraud_score) 
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+def transaction_statements(user_id, numeric, types, scores, predictions, model_version):
+    # Batched INSERT plus the matching user_stats update for scored rows
+    results = np.where(predictions == 1, "Fraudulent Transaction", "Legitimate Transaction")
+    return [
+        (INSERT_TRANSACTION_SQL,
+         [(user_id, n[0], t, n[1], n[2], n[3], n[4], n[5], r, model_version, p)
+          for n, t, r, p in zip(numeric.tolist(), types, results.tolist(), scores.tolist())]),
+        user_stats_statement(user_id, len(types), int((predictions == 1).sum()),
+                             float(numeric[:, 1].sum()))
+    ]
+
+def user_stats_statement(user_id, count, fraud_count, amount):
+    # Must be persisted together with the matching INSERT INTO transactions
+    return ("""INSERT INTO user_stats (user_id, total_transactions, fraud_count, total_amount, version)
+               VALUES (?, ?, ?, ?, 1)
+               ON CONFLICT(user_id) DO UPDATE SET
+                   total_transactions = total_transactions + excluded.total_transactions,
+                   fraud_count = fraud_count + excluded.fraud_count,
+                   total_amount = total_amount + excluded.total_amount,
+                   version = version + 1""",
+            (user_id, count, fraud_count, amount))
+
 @app.route("/dashboard")
 def dashboard():
     if 'user' not in session:
@@ -273,27 +752,15 @@ def dashboard():
         return redirect(url_for('login'))
     
     try:
-        conn = sqlite3.connect('users.db')
+        conn = get_db()
         c = conn.cursor()
         
-        # Get user's transaction history
-        c.execute("""SELECT type, amount, result, timestamp FROM transactions 
-                     WHERE user_id = ? ORDER BY timestamp DESC LIMIT 50""", 
-                  (session['user_id'],))
-        transactions = c.fetchall()
+        # First page of the user's transaction history; the page fetches the rest lazily
+        with stage("db_read"):
+            transactions, next_cursor = transaction_page(conn, session['user_id'])
         
         # Get statistics
-        c.execute("""SELECT COUNT(*) FROM transactions WHERE user_id = ?""", (session['user_id'],))
-        total_transactions = c.fetchone()[0] or 0
-        
-        c.execute("""SELECT COUNT(*) FROM transactions WHERE user_id = ? AND result = 'Fraudulent Transaction'""", 
-                  (session['user_id'],))
-        fraud_count = c.fetchone()[0] or 0
-        
-        c.execute("""SELECT SUM(amount) FROM transactions WHERE user_id = ?""", (session['user_id'],))
-        total_amount = c.fetchone()[0] or 0
-        
-        conn.close()
+        total_transactions, fraud_count, total_amount, _ = get_user_stats(c, session['user_id'])
         
         # Calculate fraud percentage
         fraud_percentage = (fraud_count / total_transactions * 100) if total_transactions > 0 else 0
@@ -302,9 +769,9 @@ def dashboard():
         chart_labels = []
         chart_data = []
         for t in transactions[:10]:  # Last 10 transactions for chart
-            if t[3]:  # timestamp exists
+            if t[4]:  # timestamp exists
                 try:
-                    chart_labels.append(t[3][:10])  # Just the date part
+                    chart_labels.append(t[4][:10])  # Just the date part
                 except:
                     chart_labels.append("Unknown")
             else:
@@ -313,6 +780,8 @@ def dashboard():
         
         return render_template("dashboard.html", 
                               transactions=transactions,
+                              next_cursor=next_cursor,
+                              transaction_types=features.TRANSACTION_TYPES,
                               total_transactions=total_transactions,
                               fraud_count=fraud_count,
                               total_amount=f"{total_amount:,.2f}",
@@ -333,32 +802,113 @@ def dashboard_stats():
         return jsonify({"error": "Not logged in"}), 401
     
     try:
-        conn = sqlite3.connect('users.db')
+        conn = get_db()
         c = conn.cursor()
         
-        c.execute("""SELECT COUNT(*) FROM transactions WHERE user_id = ?""", (session['user_id'],))
-        total_transactions = c.fetchone()[0] or 0
-        
-        c.execute("""SELECT COUNT(*) FROM transactions WHERE user_id = ? AND result = 'Fraudulent Transaction'""", 
-                  (session['user_id'],))
-        fraud_count = c.fetchone()[0] or 0
-        
-        c.execute("""SELECT SUM(amount) FROM transactions WHERE user_id = ?""", (session['user_id'],))
-        total_amount = c.fetchone()[0] or 0
-        
-        conn.close()
-        
-        fraud_percentage = (fraud_count / total_transactions * 100) if total_transactions > 0 else 0
+        total_transactions, fraud_count, total_amount, version = get_user_stats(c, session['user_id'])
         
-        return jsonify({
-            "total_transactions": total_transactions,
-            "fraud_count": fraud_count,
-            "total_amount": f"{total_amount:,.2f}",
-            "fraud_percentage": round(fraud_percentage, 2)
-        })
+        etag = stats_etag(session['user_id'], version)
+        if request.if_none_match.contains_weak(etag):
+            response = make_response("", 304)
+        else:
+            response = jsonify(stats_payload(total_transactions, fraud_count, total_amount))
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# ----------------------------------------
+# HISTORY API (KEYSET PAGINATION)
+# ----------------------------------------
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+
+RESULT_FILTERS = {
+    "fraud": "Fraudulent Transaction",
+    "legitimate": "Legitimate Transaction",
+}
+
+TRANSACTION_PAGE_COLUMNS = ["type", "amount", "result", "fraud_score", "timestamp", "id"]
+
+def transaction_page(conn, user_id, cursor=None, limit=HISTORY_PAGE_SIZE, type_filter=None, result_filter=None):
+    where, params, filters = ["user_id = ?"], [user_id], {}
+    if type_filter:
+        where.append("type = ?")
+        params.append(type_filter)
+        filters["type"] = type_filter
+    if result_filter:
+        where.append("result = ?")
+        params.append(RESULT_FILTERS[result_filter])
+        filters["result"] = RESULT_FILTERS[result_filter]
+    # Older rows may have moved to the Parquet archive. Both stores are read in one
+    # snapshot, so a batch archived meanwhile is neither missed nor shown twice.
+    with db.read_snapshot(conn):
+        rows, next_cursor = db.keyset_page(conn, f"SELECT {', '.join(TRANSACTION_PAGE_COLUMNS)} FROM transactions",
+                                           where, params, cursor, limit)
+        return transaction_archive.merge_page(conn, rows, next_cursor, TRANSACTION_PAGE_COLUMNS, user_id,
+                                              cursor, limit, filters)
+
+def chat_page(conn, user_id, cursor=None, limit=HISTORY_PAGE_SIZE):
+    return db.keyset_page(conn, "SELECT message, response, timestamp, id FROM chat_messages",
+                          ["user_id = ?"], [user_id], cursor, limit)
+
+def history_limit():
+    limit = request.args.get("limit", HISTORY_PAGE_SIZE, type=int)
+    return max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+
+@app.route("/api/transactions")
+def transactions_api():
+    if 'user' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    type_filter = request.args.get("type", "").strip().upper() or None
+    result_filter = request.args.get("result", "").strip().lower() or None
+    if type_filter and type_filter not in features.TRANSACTION_TYPES:
+        return jsonify({"error": f"Unknown transaction type: {type_filter}"}), 400
+    if result_filter and result_filter not in RESULT_FILTERS:
+        return jsonify({"error": f"result must be one of {sorted(RESULT_FILTERS)}"}), 400
+    
+    try:
+        with stage("db_read"):
+            rows, next_cursor = transaction_page(get_db(), session['user_id'],
+                                                 cursor=request.args.get("cursor"),
+                                                 limit=history_limit(),
+                                                 type_filter=type_filter,
+                                                 result_filter=result_filter)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "transactions": [
+            {"id": row_id, "type": t_type, "amount": amount, "result": result,
+             "score": score, "timestamp": timestamp}
+            for t_type, amount, result, score, timestamp, row_id in rows
+        ],
+        "next_cursor": next_cursor
+    })
+
+@app.route("/api/chat-history")
+def chat_history_api():
+    if 'user' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    try:
+        with stage("db_read"):
+            rows, next_cursor = chat_page(get_db(), session['user_id'],
+                                          cursor=request.args.get("cursor"),
+                                          limit=history_limit())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "messages": [
+            {"id": row_id, "message": message, "response": response, "timestamp": timestamp}
+            for message, response, timestamp, row_id in rows
+        ],
+        "next_cursor": next_cursor
+    })
+
 # ----------------------------------------
 # CHATBOT PAGE
 # ----------------------------------------
@@ -369,15 +919,11 @@ def chatbot():
         return redirect(url_for('login'))
     
     try:
-        conn = sqlite3.connect('users.db')
-        c = conn.cursor()
-        c.execute("""SELECT message, response, timestamp FROM chat_messages 
-                     WHERE user_id = ? ORDER BY timestamp DESC LIMIT 50""", 
-                  (session['user_id'],))
-        chat_history = c.fetchall()
-        conn.close()
+        conn = get_db()
+        with stage("db_read"):
+            chat_history, next_cursor = chat_page(conn, session['user_id'])
         
-        return render_template("chatbot.html", chat_history=chat_history)
+        return render_template("chatbot.html", chat_history=chat_history, next_cursor=next_cursor)
     except Exception as e:
         print(f"Chatbot error: {e}")
         flash("Error loading chatbot. Please try again.", "error")
@@ -386,6 +932,8 @@ def chatbot():
 # ----------------------------------------
 # CHATBOT API
 # ----------------------------------------
+INSERT_CHAT_SQL = "INSERT INTO chat_messages (user_id, message, response) VALUES (?, ?, ?)"
+
 @app.route("/chatbot_api", methods=["POST"])
 def chatbot_api():
     if 'user' not in session:
@@ -399,16 +947,11 @@ def chatbot_api():
             return jsonify({"response": "Please say something!"}), 400
         
         # Generate response
-        response = generate_chatbot_response(user_message)
+        with stage("chatbot_response"):
+            response = generate_chatbot_response(user_message)
         
         # Save to database
-        conn = sqlite3.connect('users.db')
-        c = conn.cursor()
-        c.execute("""INSERT INTO chat_messages (user_id, message, response) 
-                     VALUES (?, ?, ?)""", 
-                  (session['user_id'], user_message, response))
-        conn.commit()
-        conn.close()
+        persist([(INSERT_CHAT_SQL, (session['user_id'], user_message, response))])
         
         return jsonify({
             "response": response, 
@@ -418,80 +961,72 @@ def chatbot_api():
         print(f"Chatbot API error: {e}")
         return jsonify({"response": "Sorry, I'm having trouble responding right now."}), 500
 
-def generate_chatbot_response(message):
-    message = message.lower().strip()
-    
-    # Greetings
-    if any(word in message for word in ['hello', 'hi', 'hey', 'greetings']):
-        return "👋 Hello! I'm your fraud detection assistant. How can I help you today?"
-    
-    # What is fraud detection
-    elif 'what is fraud' in message or 'what is fraud detection' in message:
-        return "🔍 **Fraud detection** is the process of identifying suspicious transactions that could be fraudulent. Our system uses machine learning to analyze patterns and flag potential fraud in real-time, helping protect users from financial losses."
-    
-    # How it works
-    elif any(phrase in message for phrase in ['how does it work', 'how it works', 'how do you work']):
-        return "⚙️ **How our system works:**\n\n1️⃣ You enter transaction details through the form\n2️⃣ Our ML model analyzes 7 key features\n3️⃣ The system compares patterns against known fraud cases\n4️⃣ You get an instant prediction (Fraudulent/Legitimate)\n5️⃣ All transactions are saved to your dashboard for tracking"
-    
-    # Features analyzed
-    elif any(phrase in message for phrase in ['what features', 'what do you analyze', 'what data']):
-        return "📊 **Features we analyze:**\n\n• 📅 Step Number (time step)\n• 💳 Transaction Type (PAYMENT, TRANSFER, CASH_OUT, DEBIT, CASH_IN)\n• 💰 Transaction Amount\n• 🏦 Origin Account Old Balance\n• 💵 Origin Account New Balance\n• 🎯 Destination Account Old Balance\n• 💸 Destination Account New Balance"
-    
-    # Accuracy
-    elif any(word in message for word in ['accuracy', 'accurate', 'how reliable']):
-        return "🎯 **Accuracy:** Our model has been trained on thousands of transactions and achieves high accuracy in detecting fraudulent patterns. However, no system is 100% perfect. We recommend always reviewing suspicious transactions manually and staying vigilant!"
-    
-    # Data safety
-    elif any(phrase in message for phrase in ['data safe', 'data security', 'privacy', 'secure']):
-        return "🔒 **Data Security:**\n\n✅ End-to-end encryption\n✅ No storage of sensitive payment info\n✅ Password hashing for accounts\n✅ Regular security updates\n✅ GDPR compliant practices\n\nYour data is protected and only used for fraud detection!"
-    
-    # Transaction types
-    elif any(phrase in message for phrase in ['transaction types', 'types of transactions']):
-        return "💳 **Supported Transaction Types:**\n\n• 💳 PAYMENT - Regular payments\n• 🔄 TRANSFER - Money transfers\n• 💵 CASH_OUT - Cash withdrawals\n• 💳 DEBIT - Debit transactions\n• 💰 CASH_IN - Cash deposits\n\nEach type has different fraud patterns!"
-    
-    # Help
-    elif 'help' in message:
-        return "❓ **How can I help you?**\n\nYou can ask me about:\n• 🔍 What is fraud detection?\n• ⚙️ How the system works\n• 📊 Features we analyze\n• 🎯 Accuracy of predictions\n• 🔒 Data security\n• 💳 Transaction types\n• 📈 Dashboard features\n• 👤 Profile management\n\nJust type your question!"
-    
-    # Dashboard
-    elif any(word in message for word in ['dashboard', 'statistics', 'stats']):
-        return "📈 **Dashboard Features:**\n\n• View transaction history\n• See fraud statistics\n• Interactive charts\n• Achievement badges\n• Real-time updates\n• Transaction search\n\nClick on 'DASHBOARD' in the navigation menu to access it!"
-    
-    # Profile
-    elif any(word in message for word in ['profile', 'account', 'settings']):
-        return "👤 **Profile Management:**\n\n• Update your email\n• Change your full name\n• View member since date\n• Copy user ID\n• Theme preferences\n\nGo to 'PROFILE' in the navigation menu to manage your account!"
-    
-    # Theme
-    elif any(word in message for word in ['theme', 'dark mode', 'light mode', 'cyber']):
-        return "🎨 **Theme Options:**\n\n• 🌙 Dark Theme (default)\n• ☀️ Light Theme\n• 💻 Cyber Theme\n\nClick the theme switcher in the top-right corner to change themes!"
-    
-    # Keyboard shortcuts
-    elif any(phrase in message for phrase in ['keyboard', 'shortcuts', 'hotkeys']):
-        return "⌨️ **Keyboard Shortcuts:**\n\n• Ctrl + N - Home\n• Ctrl + D - Dashboard\n• Ctrl + C - Chatbot\n• Ctrl + P - Profile\n• ? - Show help\n• Esc - Close help"
-    
-    # Achievements
-    elif any(word in message for word in ['achievement', 'badge', 'trophy']):
-        return "🏆 **Achievements:**\n\n• 🔍 First Analysis - Analyze your first transaction\n• 🛡️ Fraud Hunter - Detect 5 frauds\n• 🏆 Expert Analyst - 100 total transactions\n• 🎯 Fraud Detector - Find your first fraud\n\nCheck your progress in the Dashboard!"
-    
-    # Pricing
-    elif any(word in message for word in ['price', 'cost', 'free', 'paid']):
-        return "💰 **Pricing:**\n\nGood news! Our fraud detection service is completely **FREE**! 🎉\n\n• No subscription fees\n• No hidden costs\n• Unlimited transactions\n• All features included\n\nWe believe in making financial security accessible to everyone!"
-    
-    # Thank you
-    elif any(word in message for word in ['thank', 'thanks', 'appreciate']):
-        return "🙏 You're welcome! I'm glad I could help. Feel free to ask if you have more questions!"
-    
-    # Bye
-    elif any(word in message for word in ['bye', 'goodbye', 'see you']):
-        return "👋 Goodbye! Feel free to come back if you need help. Stay safe from fraud!"
-    
-    # Default response
-    else:
-        return "🤔 I'm not sure I understand. Try asking about:\n\n• 🔍 Fraud detection\n• ⚙️ How it works\n• 📊 Features\n• 🎯 Accuracy\n• 🔒 Security\n• 💳 Transaction types\n• 📈 Dashboard\n• 👤 Profile\n• 🎨 Themes\n• ⌨️ Shortcuts\n• 🏆 Achievements\n\nOr type 'help' for more options!"
-
 # ----------------------------------------
 # PREDICTION LOGIC
 # ----------------------------------------
+def score_transaction(active, values, transaction_type, timer):
+    # Calibrated fraud score of one transaction; values in features.NUMERIC_COLUMNS order.
+    # timer(stage_name) is a context manager, e.g. stage.
+    # Identical inputs (retries, resubmissions) reuse the cached score and skip the model.
+    cache_key = (active.version, transaction_type, *values)
+    score = prediction_cache.get(cache_key)
+    PREDICTION_CACHE_REQUESTS.inc(result="miss" if score is None else "hit")
+    
+    if score is None:
+        # Features array (same encoding the model was trained with)
+        with timer("feature_build"):
+            X = active.transformer.transform_arrays([values], [transaction_type])
+        
+        # Calibrated fraud probability from one model call, shared with concurrent
+        # requests when micro-batching is on
+        with timer("model_inference"):
+            if batcher is not None:
+                score = float(batcher.fraud_probability(active, X)[0])
+            else:
+                score = float(active.scorer.fraud_probability(X)[0])
+        prediction_cache.set(cache_key, score)
+        if _startup["first_prediction"] is None:
+            _startup["first_prediction"] = time.perf_counter() - STARTUP_BEGAN
+            print(f"First prediction {_startup['first_prediction']:.2f}s after start")
+    return score
+
+def classify(score):
+    # The threshold is applied after the cache, so changing it takes effect immediately
+    return "Fraudulent Transaction" if score > fraud_threshold() else "Legitimate Transaction"
+
+def prediction_statements(user_id, values, transaction_type, result, score, model_version):
+    step, amount, oldbalanceOrg, newbalanceOrig, oldbalanceDest, newbalanceDest = values
+    return [
+        (INSERT_TRANSACTION_SQL,
+         (user_id, step, transaction_type, amount,
+          oldbalanceOrg, newbalanceOrig, oldbalanceDest, newbalanceDest, result,
+          model_version, score)),
+        user_stats_statement(user_id, 1, int(result == "Fraudulent Transaction"), amount)
+    ]
+
+def transaction_from_json(data):
+    # (values in NUMERIC_COLUMNS order, type) from a JSON object; raises ValueError
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    try:
+        values = [float(data[column]) for column in features.NUMERIC_COLUMNS]
+        transaction_type = str(data["type"]).strip().upper()
+    except KeyError as e:
+        raise ValueError(f"Missing field: {e}")
+    except (TypeError, ValueError):
+        raise ValueError("Numeric fields must be numbers")
+    if any(value < 0 for value in values[1:]):
+        raise ValueError("Amounts and balances cannot be negative")
+    return values, transaction_type
+
+def prediction_payload(result, score, model_version):
+    return {
+        "result": result,
+        "prediction": int(result == "Fraudulent Transaction"),
+        "score": round(score, 6),
+        "model_version": model_version
+    }
+
 @app.route("/predict", methods=["POST"])
 def predict():
     # Check if user is logged in
@@ -500,20 +1035,12 @@ def predict():
         return redirect(url_for('login'))
     
     try:
+        # Snapshot the active model so a concurrent hot-swap doesn't affect this request
+        active = models.current()
+        
         # Get values from form
         step = float(request.form["step"])
-        
-        # Encode transaction type
-        type_mapping = {
-            "PAYMENT": 0,
-            "TRANSFER": 1,
-            "CASH_OUT": 2,
-            "DEBIT": 3,
-            "CASH_IN": 4
-        }
         transaction_type = request.form["type"]
-        type_ = float(type_mapping[transaction_type])
-        
         amount = float(request.form["amount"])
         oldbalanceOrg = float(request.form["oldbalanceOrg"])
         newbalanceOrig = float(request.form["newbalanceOrig"])
@@ -529,33 +1056,15 @@ def predict():
             flash("Balances cannot be negative!", "error")
             return redirect(url_for('home'))
         
-        # Features array
-        features = np.array([[step, type_, amount,
-                              oldbalanceOrg, newbalanceOrig,
-                              oldbalanceDest, newbalanceDest]])
-
-        # Prediction
-        prediction = model.predict(features)
-
-        if prediction[0] == 1:
-            result = "Fraudulent Transaction"
-        else:
-            result = "Legitimate Transaction"
+        values = [step, amount, oldbalanceOrg, newbalanceOrig, oldbalanceDest, newbalanceDest]
+        score = score_transaction(active, values, transaction_type, stage)
+        result = classify(score)
         
         # Save transaction to database
-        conn = sqlite3.connect('users.db')
-        c = conn.cursor()
-        c.execute("""INSERT INTO transactions 
-                     (user_id, step, type, amount, oldbalanceOrg, newbalanceOrig, 
-                      oldbalanceDest, newbalanceDest, result) 
-                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                  (session['user_id'], step, transaction_type, amount, 
-                   oldbalanceOrg, newbalanceOrig, oldbalanceDest, newbalanceDest, result))
-        conn.commit()
-        conn.close()
+        persist(prediction_statements(session['user_id'], values, transaction_type, result, score, active.version))
         
         # Flash success message
-        flash(f"Transaction analyzed successfully! Result: {result}", "success")
+        flash(f"Transaction analyzed successfully! Result: {result} (fraud score {score:.2f})", "success")
 
     except Exception as e:
         print(f"Prediction error: {e}")
@@ -564,12 +1073,222 @@ def predict():
 
     return render_template("submit.html", result=result)
 
+# ----------------------------------------
+# JSON PREDICTION API
+# ----------------------------------------
+@app.route("/api/predict", methods=["POST"])
+def predict_api():
+    if 'user' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    active = models.current()
+    try:
+        values, transaction_type = transaction_from_json(request.get_json(silent=True))
+        score = score_transaction(active, values, transaction_type, stage)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    result = classify(score)
+    persist(prediction_statements(session['user_id'], values, transaction_type, result, score, active.version))
+    return jsonify(prediction_payload(result, score, active.version))
+
+# ----------------------------------------
+# BATCH PREDICTION API
+# ----------------------------------------
+def parse_batch_rows():
+    # Accept either a JSON body ({"transactions": [...]} or a bare list) or CSV with a header row
+    if request.is_json:
+        data = request.get_json()
+        rows = data.get("transactions", []) if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise ValueError("Expected a list of transactions")
+        return rows
+    text = request.get_data(as_text=True)
+    return list(csv.DictReader(io.StringIO(text)))
+
+@app.route("/api/predict/batch", methods=["POST"])
+def predict_batch():
+    if 'user' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+
+    try:
+        with stage("parse_body"):
+            rows = parse_batch_rows()
+    except Exception as e:
+        return jsonify({"error": f"Could not parse request body: {e}"}), 400
+
+    if not rows:
+        return jsonify({"error": "No transactions supplied"}), 400
+    if len(rows) > MAX_BATCH_ROWS:
+        return jsonify({"error": f"Batch too large (max {MAX_BATCH_ROWS} rows)"}), 413
+
+    # Snapshot the active model so a concurrent hot-swap doesn't affect this request
+    active = models.current()
+
+    try:
+        # One (N, 6) numeric matrix for the whole batch, then the model's encoding
+        with stage("feature_build"):
+            numeric = features.numeric_matrix(rows)
+            types = features.normalize_types(rows)
+            if (numeric[:, 1:] < 0).any():
+                raise ValueError("Amounts and balances cannot be negative")
+            X = active.transformer.transform_arrays(numeric, types)
+    except KeyError as e:
+        return jsonify({"error": f"Missing field: {e}"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        # One vectorized call for the whole batch
+        threshold = fraud_threshold()
+        with stage("model_inference"):
+            scores = active.scorer.fraud_probability(X)
+        predictions = (scores > threshold).astype(np.int64)
+        results = np.where(predictions == 1, "Fraudulent Transaction", "Legitimate Transaction")
+
+        # Save all transactions in a single database transaction
+        persist(transaction_statements(session['user_id'], numeric, types, scores, predictions, active.version))
+
+        return jsonify({
+            "model_version": active.version,
+            "threshold": threshold,
+            "count": len(rows),
+            "fraud_count": int((predictions == 1).sum()),
+            "results": [{"index": i, "prediction": int(p), "result": r, "score": round(sc, 6)}
+                        for i, (p, r, sc) in enumerate(zip(predictions.tolist(), results.tolist(),
+                                                           scores.tolist()))]
+        })
+    except Exception as e:
+        print(f"Batch prediction error: {e}")
+        return jsonify({"error": "Error analyzing transactions."}), 500
+
+# ----------------------------------------
+# BULK CSV UPLOAD (BACKGROUND SCORING JOBS)
+# ----------------------------------------
+MAX_UPLOAD_MB = int(os.environ.get("MAX_UPLOAD_MB", "512"))
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_MB * 1024 * 1024
+
+def scoring_job_statements(user_id, chunk, scores, predictions, model_version):
+    numeric = chunk[features.NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+    return transaction_statements(user_id, numeric, chunk["type"].tolist(), scores, predictions, model_version)
+
+scoring_jobs = jobs.ScoringJobs(db_pool, models, scoring_job_statements, fraud_threshold)
+atexit.register(scoring_jobs.close)
+
+@app.route("/upload")
+def upload():
+    if 'user' not in session:
+        flash("Please login to upload transactions!", "error")
+        return redirect(url_for('login'))
+    return render_template("upload.html", max_upload_mb=MAX_UPLOAD_MB)
+
+@app.route("/api/jobs", methods=["GET", "POST"])
+def jobs_api():
+    if 'user' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    
+    if request.method == "GET":
+        return jsonify({"jobs": scoring_jobs.list(session['user_id'])})
+    
+    # Multipart upload from the upload page, or the CSV as the raw request body
+    upload_file = request.files.get("file")
+    if upload_file is not None:
+        filename, stream = upload_file.filename or "upload.csv", upload_file.stream
+    elif request.mimetype == "text/csv":
+        filename, stream = request.args.get("filename", "upload.csv"), request.stream
+    else:
+        return jsonify({"error": "Send a CSV as the 'file' form field or with Content-Type: text/csv"}), 400
+    
+    with stage("upload_save"):
+        job_id = scoring_jobs.submit(session['user_id'], filename, stream)
+    
+    response = jsonify({"job_id": job_id, "status_url": url_for('job_status', job_id=job_id)})
+    response.status_code = 202
+    response.headers["Location"] = url_for('job_status', job_id=job_id)
+    return response
+
+@app.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    if 'user' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    job = scoring_jobs.get(job_id, session['user_id'])
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    job["results_url"] = url_for('job_results', job_id=job_id)
+    return jsonify(job)
+
+@app.route("/api/jobs/<job_id>/results")
+def job_results(job_id):
+    # Predictions written so far; complete once the job status is "done"
+    if 'user' not in session:
+        return jsonify({"error": "Not logged in"}), 401
+    if scoring_jobs.get(job_id, session['user_id']) is None:
+        return jsonify({"error": "Job not found"}), 404
+    path = scoring_jobs.results_path(job_id)
+    if not os.path.exists(path):
+        return jsonify({"error": "No results yet"}), 404
+    return send_file(os.path.abspath(path), mimetype="text/csv", as_attachment=True,
+                     download_name=f"{job_id}-results.csv", max_age=0)
+
+# ----------------------------------------
+# MODEL ADMIN API
+# ----------------------------------------
+def is_admin_request():
+    return ADMIN_TOKEN is not None and request.headers.get("X-Admin-Token") == ADMIN_TOKEN
+
+@app.route("/admin/model")
+def admin_model():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    
+    active = models.current()
+    return jsonify({
+        "version": active.version,
+        "metadata": active.metadata,
+        "available_versions": registry.list_versions(),
+        "last_error": models.last_error,
+        "threshold": fraud_threshold()
+    })
+
+@app.route("/admin/threshold", methods=["GET", "POST"])
+def admin_threshold():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        try:
+            threshold = float(data["threshold"])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "Expected JSON {\"threshold\": <number between 0 and 1>}"}), 400
+        if not 0.0 <= threshold <= 1.0:
+            return jsonify({"error": "Threshold must be between 0 and 1"}), 400
+        set_fraud_threshold(threshold)
+    
+    return jsonify({"threshold": fraud_threshold()})
+
+@app.route("/admin/model/reload", methods=["POST"])
+def admin_model_reload():
+    if not is_admin_request():
+        return jsonify({"error": "Forbidden"}), 403
+    
+    # Load + warm in the background; the swap happens once the new model is ready
+    data = request.get_json(silent=True) or {}
+    version = data.get("version")
+    if version and version not in registry.list_versions():
+        return jsonify({"error": f"Unknown model version {version}"}), 404
+    
+    version = models.swap_async(version)
+    if version is None:
+        return jsonify({"error": "No published model versions"}), 404
+    return jsonify({"status": "loading", "version": version, "serving": models.current().version}), 202
+
 # ----------------------------------------
 # RESULT PAGE
 # ----------------------------------------
 @app.route("/result/<result>")
 def show_result(result):
-    return render_template("predict.html", prediction_text=result)
+    return render_cached("predict.html", prediction_text=result)
 
 # ----------------------------------------
 # ERROR HANDLERS
@@ -582,8 +1301,19 @@ def page_not_found(e):
 def internal_server_error(e):
     return render_template("500.html"), 500
 
+# ----------------------------------------
+# STARTUP REPORT
+# ----------------------------------------
+end_startup_phase("app_setup")
+startup_phases["total"] = time.perf_counter() - STARTUP_BEGAN
+print("Startup: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in startup_phases.items()))
+
 # ----------------------------------------
 # RUN APP
 # ----------------------------------------
+# Development server only; use serve.py in production
 if __name__ == "__main__":
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Password hash workers start from a forkserver, which re-runs the main
+    # script in each new process unless it has no file to run
+    del sys.modules["__main__"].__file__
+    app.run(debug=os.environ.get("FLASK_DEBUG", "1") == "1", host='0.0.0.0', port=5000)
\ No newline at end of file
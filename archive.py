@@ -0,0 +1,231 @@
+# ----------------------------------------
+# TRANSACTION ARCHIVE
+# ----------------------------------------
+# Keeps the transactions table small enough to stay in SQLite's page cache.
+# Rows older than a configurable age are moved in batches into compressed
+# Parquet files, partitioned by month:
+#
+#   archive/transactions/month=2026-03/<first id>-<last id>.parquet
+#
+# A batch is written to its files first. Its rows are then deleted in the same
+# SQLite transaction that records the files in archive_batches. Readers only
+# open recorded files, so a row is always either hot or archived, never both.
+# Files left behind by a crash before the commit are unrecorded; the next run
+# removes them. Batches run under BEGIN IMMEDIATE, so server processes
+# archiving at the same time take turns instead of archiving a row twice.
+#
+# merge_page() completes a keyset page of hot rows (see db.keyset_page) with
+# archived rows, so history views read both stores as one. The hot query and
+# merge_page() must run in one read transaction (db.read_snapshot). Files are
+# chosen from the archive_batches rows that snapshot sees, so to the reader a
+# batch committed in between is either still hot or already archived.
+# Dashboard totals come from user_stats, whose running counters already
+# include archived rows.
+#
+#   python archive.py --older-than-days 90
+# ----------------------------------------
+import argparse
+import os
+import threading
+import time
+
+import db
+
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", os.path.join("archive", "transactions"))
+ARCHIVE_BATCH_ROWS = int(os.environ.get("ARCHIVE_BATCH_ROWS", "5000"))
+
+# Archived columns, in SELECT order, with their Parquet types
+COLUMNS = [
+    ("id", "int64"), ("user_id", "int64"), ("step", "float64"), ("type", "string"), ("amount", "float64"),
+    ("oldbalanceOrg", "float64"), ("newbalanceOrig", "float64"),
+    ("oldbalanceDest", "float64"), ("newbalanceDest", "float64"),
+    ("result", "string"), ("timestamp", "string"), ("model_version", "string"), ("fraud_score", "float64"),
+]
+
+SCHEMA_SQL = '''CREATE TABLE IF NOT EXISTS archive_batches
+                (file TEXT PRIMARY KEY,
+                 month TEXT NOT NULL,
+                 first_id INTEGER,
+                 last_id INTEGER,
+                 rows INTEGER,
+                 min_timestamp TEXT,
+                 max_timestamp TEXT,
+                 created_at REAL)'''
+
+
+def month_of(timestamp):
+    # "2026-03-14 09:26:53" -> "2026-03"
+    return str(timestamp)[:7]
+
+
+class TransactionArchive:
+    def __init__(self, pool, archive_dir=ARCHIVE_DIR, batch_rows=ARCHIVE_BATCH_ROWS):
+        self.pool = pool
+        self.archive_dir = archive_dir
+        self.batch_rows = batch_rows
+        self._thread = None
+
+    # ---- moving rows ----
+
+    def archive_batch(self, older_than_days):
+        # Archives up to batch_rows rows older than the cutoff; returns how many
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        conn = self.pool.acquire()
+        written = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(f"""SELECT {', '.join(name for name, _ in COLUMNS)} FROM transactions
+                                    WHERE timestamp < datetime('now', ?) ORDER BY id LIMIT ?""",
+                                (f"-{older_than_days} days", self.batch_rows)).fetchall()
+            if not rows:
+                conn.rollback()
+                return 0
+            self._remove_orphans(conn)
+
+            months = {}
+            for row in rows:
+                months.setdefault(month_of(row[10]), []).append(row)
+
+            schema = pa.schema([(name, kind) for name, kind in COLUMNS])
+            batches = []
+            for month, month_rows in months.items():
+                # Sorted by user, so readers' user_id filters can skip most row groups
+                month_rows.sort(key=lambda row: (row[1], row[10], row[0]))
+                ids = [row[0] for row in month_rows]
+                timestamps = [row[10] for row in month_rows]
+                name = os.path.join(f"month={month}", f"{min(ids)}-{max(ids)}.parquet")
+                path = os.path.join(self.archive_dir, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                table = pa.Table.from_pylist([dict(zip(schema.names, row)) for row in month_rows], schema=schema)
+                pq.write_table(table, path + ".tmp", compression="zstd")
+                os.replace(path + ".tmp", path)
+                written.append(path)
+                batches.append((name, month, min(ids), max(ids), len(ids), min(timestamps), max(timestamps),
+                                time.time()))
+
+            conn.executemany("DELETE FROM transactions WHERE id = ?", [(row[0],) for row in rows])
+            conn.executemany("""INSERT OR REPLACE INTO archive_batches
+                                (file, month, first_id, last_id, rows, min_timestamp, max_timestamp, created_at)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", batches)
+            conn.commit()
+            return len(rows)
+        except Exception:
+            conn.rollback()
+            for path in written:
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        finally:
+            self.pool.release(conn)
+
+    def _remove_orphans(self, conn):
+        # Files from batches that never committed (called with the write lock held)
+        if not os.path.isdir(self.archive_dir):
+            return
+        recorded = {row[0] for row in conn.execute("SELECT file FROM archive_batches")}
+        for month_dir in os.listdir(self.archive_dir):
+            if not os.path.isdir(os.path.join(self.archive_dir, month_dir)):
+                continue  # stray files (a README, .DS_Store) are not ours to remove
+            for filename in os.listdir(os.path.join(self.archive_dir, month_dir)):
+                name = os.path.join(month_dir, filename)
+                if filename.endswith(".parquet") and name not in recorded:
+                    os.remove(os.path.join(self.archive_dir, name))
+
+    def run(self, older_than_days, pause=0.05):
+        # Archives everything older than the cutoff, one batch (and lock) at a time
+        total = 0
+        start = time.time()
+        while True:
+            archived = self.archive_batch(older_than_days)
+            total += archived
+            if archived < self.batch_rows:
+                break
+            time.sleep(pause)  # let request writes in between batches
+        if total:
+            print(f"Archived {total} transactions older than {older_than_days} days "
+                  f"in {time.time() - start:.1f}s")
+        return total
+
+    def start(self, older_than_days, interval):
+        def loop():
+            while True:
+                try:
+                    self.run(older_than_days)
+                except Exception as e:
+                    print(f"Archive error: {e}")
+                time.sleep(interval)
+
+        self._thread = threading.Thread(target=loop, name="transaction-archive", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    # ---- reading ----
+
+    def merge_page(self, conn, rows, next_cursor, columns, user_id, cursor=None, limit=50, filters=None):
+        # rows, next_cursor: a hot page from db.keyset_page whose columns (ending in
+        # timestamp, id) are given in columns; filters: {column: value} equality filters.
+        # Returns the same page over hot and archived rows together.
+        archived_until = conn.execute("SELECT MAX(max_timestamp) FROM archive_batches").fetchone()[0]
+        if archived_until is None:
+            return rows, next_cursor
+        if next_cursor is not None and rows[-1][-2] > archived_until:
+            return rows, next_cursor  # a full page newer than anything archived
+
+        archived = self.read_page(conn, columns, user_id, cursor, limit, filters or {})
+        merged = sorted(list(rows) + archived, key=lambda row: (row[-2], row[-1]), reverse=True)
+        if next_cursor is not None or len(merged) > limit:
+            merged = merged[:limit]
+            return merged, db.encode_cursor(merged[-1][-2], merged[-1][-1])
+        return merged, None
+
+    def read_page(self, conn, columns, user_id, cursor, limit, filters):
+        # Up to limit + 1 archived rows for the user before cursor, newest first
+        import pyarrow.dataset as ds
+
+        expression = ds.field("user_id") == user_id
+        for column, value in filters.items():
+            expression &= ds.field(column) == value
+        months_sql = "SELECT DISTINCT month FROM archive_batches ORDER BY month DESC"
+        params = ()
+        if cursor:
+            timestamp, row_id = db.decode_cursor(cursor)
+            expression &= (ds.field("timestamp") < timestamp) | (
+                (ds.field("timestamp") == timestamp) & (ds.field("id") < row_id))
+            months_sql = "SELECT DISTINCT month FROM archive_batches WHERE month <= ? ORDER BY month DESC"
+            params = (month_of(timestamp),)
+
+        found = []
+        # Months are disjoint in time, so stop at the first month that fills the page
+        for (month,) in conn.execute(months_sql, params).fetchall():
+            files = [os.path.join(self.archive_dir, row[0]) for row in
+                     conn.execute("SELECT file FROM archive_batches WHERE month = ?", (month,))]
+            table = ds.dataset(files, format="parquet").to_table(columns=columns, filter=expression)
+            found.extend(zip(*(table.column(name).to_pylist() for name in columns)))
+            if len(found) > limit:
+                break
+        found.sort(key=lambda row: (row[-2], row[-1]), reverse=True)
+        return found[:limit + 1]
+
+
+# ----------------------------------------
+# COMMAND LINE
+# ----------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Move old transactions from users.db to Parquet files.")
+    parser.add_argument("--older-than-days", type=float, required=True)
+    parser.add_argument("--batch-rows", type=int, default=ARCHIVE_BATCH_ROWS)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    pool = db.ConnectionPool(size=1)
+    conn = pool.acquire()
+    with conn:
+        conn.execute(SCHEMA_SQL)
+    pool.release(conn)
+    TransactionArchive(pool, args.archive_dir, args.batch_rows).run(args.older_than_days)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+# ----------------------------------------
+# ASGI SERVING MODE
+# ----------------------------------------
+# Serves the hot JSON endpoints natively on asyncio and everything else
+# through the Flask app:
+#
+#   POST /chatbot_api          chatbot reply
+#   GET  /api/dashboard-stats  dashboard polling (ETag / 304)
+#   POST /api/predict          JSON variant of /predict
+#
+# Waiting on SQLite never blocks the event loop: queries go through a small
+# pool of aiosqlite connections, each running in its own thread. Model
+# inference runs in a thread pool. An idle dashboard poll therefore holds no
+# thread at all, and a few processes can keep thousands of them open.
+# Request handling (sessions, validation, SQL, caching, thresholds) is shared
+# with app.py, so both serving modes behave the same.
+#
+#   python serve.py --workers 4
+# ----------------------------------------
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import aiosqlite
+from a2wsgi import WSGIMiddleware
+from itsdangerous import BadSignature
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_etags, quote_etag
+
+import db
+import metrics
+import app as flask_module
+from chatbot import generate_chatbot_response
+
+flask_app = flask_module.app
+
+ASYNC_DB_POOL_SIZE = int(os.environ.get("ASYNC_DB_POOL_SIZE", "8"))
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", "4"))
+WSGI_THREADS = int(os.environ.get("WSGI_THREADS", "16"))
+
+
+# ----------------------------------------
+# ASYNC SQLITE POOL
+# ----------------------------------------
+class AsyncConnectionPool:
+    def __init__(self, path=db.DB_PATH, size=ASYNC_DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = asyncio.LifoQueue()
+        self._connections = []
+
+    async def open(self):
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(self.path, timeout=db.BUSY_TIMEOUT_MS / 1000,
+                                           cached_statements=db.STATEMENT_CACHE)
+            for pragma in db.PRAGMAS:
+                await conn.execute(pragma)
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections = []
+
+    @asynccontextmanager
+    async def connection(self):
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def fetchone(self, sql, params):
+        async with self.connection() as conn:
+            async with conn.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+
+    async def execute_statements(self, statements):
+        # Same (sql, params) lists as db.execute_statements, committed together
+        async with self.connection() as conn:
+            try:
+                for sql, params in statements:
+                    if isinstance(params, list):
+                        await conn.executemany(sql, params)
+                    else:
+                        await conn.execute(sql, params)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+
+
+db_pool = AsyncConnectionPool()
+inference_pool = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix="inference")
+
+
+async def persist(statements, route):
+    # Write-behind queue when enabled (DB_WRITE_MODE=async), else commit before responding
+    if flask_module.write_queue is not None:
+        with stage(route, "db_enqueue"):
+            if flask_module.write_queue.submit(statements):
+                return
+    with stage(route, "db_write"):
+        await db_pool.execute_statements(statements)
+
+
+# ----------------------------------------
+# SESSIONS AND METRICS
+# ----------------------------------------
+# Flask keeps the session in a signed cookie, so it can be read here with the
+# same serializer and secret key
+session_serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+
+
+def load_session(request):
+    cookie = request.cookies.get(flask_app.config["SESSION_COOKIE_NAME"])
+    if not cookie or session_serializer is None:
+        return {}
+    try:
+        return session_serializer.loads(
+            cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return {}
+
+
+def stage(route, name):
+    return metrics.timer(flask_module.STAGE_SECONDS, route=route, stage=name)
+
+
+def endpoint(route):
+    # Records fraud_request_seconds like the Flask hooks do, under the Flask endpoint name
+    def decorate(handler):
+        async def wrapper(request):
+            start = time.perf_counter()
+            response = await handler(request)
+            flask_module.REQUEST_SECONDS.observe(time.perf_counter() - start, route=route,
+                                                 method=request.method, status=response.status_code)
+            return response
+        return wrapper
+    return decorate
+
+
+def not_logged_in():
+    return JSONResponse({"error": "Not logged in"}, status_code=401)
+
+
+# ----------------------------------------
+# ENDPOINTS
+# ----------------------------------------
+@endpoint("chatbot_api")
+async def chatbot_api(request: Request):
+    session = load_session(request)
+    if 'user' not in session:
+        return not_logged_in()
+
+    try:
+        data = await request.json()
+        user_message = data.get("message", "").strip()
+
+        if not user_message:
+            return JSONResponse({"response": "Please say something!"}, status_code=400)
+
+        with stage("chatbot_api", "chatbot_response"):
+            response = generate_chatbot_response(user_message)
+
+        await persist([(flask_module.INSERT_CHAT_SQL, (session['user_id'], user_message, response))],
+                      "chatbot_api")
+
+        return JSONResponse({
+            "response": response,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M")
+        })
+    except Exception as e:
+        print(f"Chatbot API error: {e}")
+        return JSONResponse({"response": "Sorry, I'm having trouble responding right now."}, status_code=500)
+
+
+@endpoint("dashboard_stats")
+async def dashboard_stats(request: Request):
+    session = load_session(request)
+    if 'user' not in session:
+        return not_logged_in()
+
+    try:
+        with stage("dashboard_stats", "db_read"):
+            row = await db_pool.fetchone(flask_module.USER_STATS_SQL, (session['user_id'],))
+        total_transactions, fraud_count, total_amount, version = row if row else (0, 0, 0, 0)
+
+        etag = flask_module.stats_etag(session["user_id"], version)
+        headers = {"ETag": quote_etag(etag), "Cache-Control": "private, no-cache"}
+        # Weak comparison, as RFC 9110 requires for If-None-Match (W/"..." tags, lists and *)
+        if parse_etags(request.headers.get("if-none-match")).contains_weak(etag):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(flask_module.stats_payload(total_transactions, fraud_count, total_amount),
+                            headers=headers)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+def score_and_classify(active, values, transaction_type):
+    # Runs on the inference pool: cache lookup, features, model call and threshold
+    score = flask_module.score_transaction(active, values, transaction_type,
+                                           lambda name: stage("predict_api", name))
+    return score, flask_module.classify(score)
+
+
+@endpoint("predict_api")
+async def predict_api(request: Request):
+    session = load_session(request)
+    if 'user' not in session:
+        return not_logged_in()
+
+    active = flask_module.models.current()
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        values, transaction_type = flask_module.transaction_from_json(data)
+        loop = asyncio.get_running_loop()
+        score, result = await loop.run_in_executor(inference_pool, score_and_classify,
+                                                   active, values, transaction_type)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    await persist(flask_module.prediction_statements(session['user_id'], values, transaction_type,
+                                                     result, score, active.version), "predict_api")
+    return JSONResponse(flask_module.prediction_payload(result, score, active.version))
+
+
+# ----------------------------------------
+# APPLICATION
+# ----------------------------------------
+@asynccontextmanager
+async def lifespan(_):
+    await db_pool.open()
+    try:
+        yield
+    finally:
+        await db_pool.close()
+        inference_pool.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route("/chatbot_api", chatbot_api, methods=["POST"]),
+        Route("/api/dashboard-stats", dashboard_stats, methods=["GET"]),
+        Route("/api/predict", predict_api, methods=["POST"]),
+        # Pages, forms and the remaining APIs are served by Flask on a thread pool
+        Mount("/", app=WSGIMiddleware(flask_app, workers=WSGI_THREADS)),
+    ],
+    lifespan=lifespan,
+)
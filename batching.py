@@ -0,0 +1,84 @@
+# ----------------------------------------
+# MICRO-BATCHING INFERENCE
+# ----------------------------------------
+# Concurrent single-row predictions are funnelled through one scheduler
+# thread. After the first request arrives it keeps collecting for up to
+# max_wait seconds (or until max_batch rows are queued), stacks the rows and
+# makes a single vectorized model call, then hands each caller its slice.
+# With many concurrent users this replaces N one-row calls, whose cost is
+# mostly per-call Python/sklearn overhead, with one N-row call. Callers wait at
+# most timeout seconds for their scores, so a stuck batch can't hang requests.
+# ----------------------------------------
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    def __init__(self, max_batch=64, max_wait=0.002, on_batch=None, timeout=10.0):
+        # on_batch(rows, queue_waits) is called after every batch, e.g. for metrics
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.on_batch = on_batch
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def fraud_probability(self, active, X):
+        # Blocks until the batch containing X has been scored; returns X's scores.
+        # Raises concurrent.futures.TimeoutError if that takes longer than timeout.
+        future = Future()
+        self._queue.put((active, np.asarray(X, dtype=np.float64), time.perf_counter(), future))
+        return future.result(timeout=self.timeout)
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            rows = len(items[0][1])
+            deadline = time.perf_counter() + self.max_wait
+            while rows < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                items.append(item)
+                rows += len(item[1])
+            try:
+                self._score(items, rows)
+            except Exception as e:
+                # Keep the scheduler thread alive; fail whatever this batch left unanswered
+                print(f"Micro-batch error: {e}")
+                for _, _, _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _score(self, items, rows):
+        start = time.perf_counter()
+        # Requests that snapshotted different models (around a hot-swap) are scored separately
+        groups = {}
+        for item in items:
+            groups.setdefault(id(item[0]), []).append(item)
+
+        for group in groups.values():
+            active = group[0][0]
+            try:
+                scores = active.scorer.fraud_probability(np.vstack([X for _, X, _, _ in group]))
+            except Exception as e:
+                for _, _, _, future in group:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for _, X, _, future in group:
+                future.set_result(scores[offset:offset + len(X)])
+                offset += len(X)
+
+        if self.on_batch is not None:
+            try:
+                self.on_batch(rows, [start - submitted for _, _, submitted, _ in items])
+            except Exception as e:
+                print(f"Micro-batch callback error: {e}")
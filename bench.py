@@ -0,0 +1,420 @@
+# ----------------------------------------
+# BENCHMARK HARNESS
+# ----------------------------------------
+# Drives /predict, /api/dashboard-stats, /dashboard and /chatbot_api against a
+# freshly seeded copy of the database, either in-process through Flask's test
+# client or over HTTP against a multi-worker server on localhost, and writes
+# throughput and p50/p95/p99 latency per endpoint as JSON.
+#
+#   python bench.py run --users 50 --transactions 2000 --requests 4000 -o base.json
+#   python bench.py run --server --workers 4 --concurrency 32 -o new.json
+#   python bench.py run --server --asgi --workers 4 --concurrency 32 -o asgi.json
+#   python bench.py compare base.json new.json --threshold 0.10
+#   python bench.py chatbot --intents 16,160,1600
+# ----------------------------------------
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+
+import numpy as np
+
+BENCH_PASSWORD = "bench-password"
+TRANSACTION_TYPES = ["CASH_IN", "CASH_OUT", "DEBIT", "PAYMENT", "TRANSFER"]
+ENDPOINTS = ["predict", "dashboard_stats", "dashboard", "chatbot_api"]
+DEFAULT_MIX = "predict=4,dashboard_stats=4,dashboard=1,chatbot_api=1"
+CHAT_MESSAGES = ["hello", "how does it work", "what features", "accuracy",
+                 "transaction types", "dashboard", "thanks", "something else"]
+
+
+# ----------------------------------------
+# DATABASE SEEDING
+# ----------------------------------------
+def random_transaction(rng):
+    amount = round(rng.uniform(1, 200000), 2)
+    old_org = round(rng.uniform(0, 300000), 2)
+    old_dest = round(rng.uniform(0, 300000), 2)
+    return {
+        "step": rng.randint(1, 743),
+        "type": rng.choice(TRANSACTION_TYPES),
+        "amount": amount,
+        "oldbalanceOrg": old_org,
+        "newbalanceOrig": max(old_org - amount, 0.0),
+        "oldbalanceDest": old_dest,
+        "newbalanceDest": old_dest + amount,
+    }
+
+
+def seed_database(path, users, transactions_per_user, seed=42):
+    # The schema must already exist (run() imports the app against this path first)
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    with conn:
+        conn.executemany("INSERT INTO users (username, password, email, full_name) VALUES (?, ?, ?, ?)",
+                         [(f"bench{i}", password_hash, f"bench{i}@example.com", f"Bench User {i}")
+                          for i in range(users)])
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE username LIKE 'bench%'")]
+        for user_id in user_ids:
+            rows = []
+            for _ in range(transactions_per_user):
+                t = random_transaction(rng)
+                result = "Fraudulent Transaction" if rng.random() < 0.01 else "Legitimate Transaction"
+                rows.append((user_id, t["step"], t["type"], t["amount"], t["oldbalanceOrg"],
+                             t["newbalanceOrig"], t["oldbalanceDest"], t["newbalanceDest"], result))
+            conn.executemany("""INSERT INTO transactions
+                                (user_id, step, type, amount, oldbalanceOrg, newbalanceOrig,
+                                 oldbalanceDest, newbalanceDest, result)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+        # Rebuild the per-user summary rows for the seeded data
+        conn.execute("DELETE FROM user_stats")
+        conn.execute("""INSERT INTO user_stats (user_id, total_transactions, fraud_count, total_amount, version)
+                        SELECT user_id, COUNT(*),
+                               SUM(CASE WHEN result = 'Fraudulent Transaction' THEN 1 ELSE 0 END),
+                               COALESCE(SUM(amount), 0), 1
+                        FROM transactions WHERE user_id IS NOT NULL GROUP BY user_id""")
+    conn.close()
+    return [f"bench{i}" for i in range(users)]
+
+
+# ----------------------------------------
+# CLIENTS
+# ----------------------------------------
+# A missing or expired session makes protected routes redirect to /login.
+# Those redirects are cheap, so they are reported as errors (401), not as
+# fast successful requests.
+def status_of(status, location):
+    if 300 <= status < 400 and urllib.parse.urlsplit(location or "").path == "/login":
+        return 401
+    return status
+
+
+def check_login(session, username):
+    if session.request("GET", "/dashboard") != 200:
+        raise RuntimeError(f"Login as {username} failed: /dashboard is not reachable")
+
+
+class TestClientSession:
+    def __init__(self, app, username):
+        self.client = app.test_client()
+        self.client.post("/login", data={"username": username, "password": BENCH_PASSWORD})
+        check_login(self, username)
+
+    def request(self, method, path, form=None, json_body=None):
+        response = self.client.open(path, method=method, data=form, json=json_body)
+        return status_of(response.status_code, response.headers.get("Location"))
+
+
+class HttpSession:
+    def __init__(self, host, port, username):
+        self.conn = http.client.HTTPConnection(host, port, timeout=30)
+        self.cookie = None
+        self.request("POST", "/login", form={"username": username, "password": BENCH_PASSWORD})
+        check_login(self, username)
+
+    def request(self, method, path, form=None, json_body=None):
+        headers = {}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif json_body is not None:
+            body = json.dumps(json_body)
+            headers["Content-Type"] = "application/json"
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            # Reconnect once (server closed the keep-alive connection)
+            self.conn.close()
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            response.read()
+        set_cookie = response.getheader("Set-Cookie")
+        if set_cookie:
+            self.cookie = set_cookie.split(";", 1)[0]
+        return status_of(response.status, response.getheader("Location"))
+
+
+def make_request(session, endpoint, rng):
+    if endpoint == "predict":
+        return session.request("POST", "/predict", form=random_transaction(rng))
+    if endpoint == "dashboard_stats":
+        return session.request("GET", "/api/dashboard-stats")
+    if endpoint == "dashboard":
+        return session.request("GET", "/dashboard")
+    return session.request("POST", "/chatbot_api", json_body={"message": rng.choice(CHAT_MESSAGES)})
+
+
+# ----------------------------------------
+# SERVER
+# ----------------------------------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, workers, env, asgi=False):
+    if asgi:
+        command = [sys.executable, "serve.py", "--mode", "asgi", "--workers", str(workers),
+                   "--host", "127.0.0.1", "--port", str(port)]
+    elif importlib.util.find_spec("gunicorn") is not None:
+        command = [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}",
+                   "--log-level", "warning", "app:app"]
+    else:
+        # werkzeug's forking mode forks per request, which would mostly measure fork()
+        print("gunicorn is not installed; falling back to a threaded werkzeug server (1 process)")
+        command = [sys.executable, "-c",
+                   "import app; from werkzeug.serving import run_simple; "
+                   f"run_simple('127.0.0.1', {port}, app.app, threaded=True)"]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/login")
+            conn.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Server did not start")
+
+
+# ----------------------------------------
+# RUN
+# ----------------------------------------
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {name}; choose from {ENDPOINTS}")
+        mix[name] = float(weight)
+    return mix
+
+
+def summarize(samples, elapsed):
+    report = {}
+    for endpoint in ENDPOINTS + ["all"]:
+        rows = samples if endpoint == "all" else [s for s in samples if s[0] == endpoint]
+        if not rows:
+            continue
+        latencies = np.array([s[1] for s in rows]) * 1000
+        errors = sum(1 for s in rows if s[2] >= 400)
+        report[endpoint] = {
+            "requests": len(rows),
+            "errors": errors,
+            "throughput_rps": round(len(rows) / elapsed, 2),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+            "mean_ms": round(float(latencies.mean()), 3),
+        }
+    return report
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="fraud-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    env = dict(os.environ, FRAUD_DB_PATH=db_path)
+    os.environ["FRAUD_DB_PATH"] = db_path
+
+    # Importing the app creates the schema in the bench database
+    import app as fraud_app
+    print(f"Seeding {args.users} users x {args.transactions} transactions into {db_path}")
+    usernames = seed_database(db_path, args.users, args.transactions, args.seed)
+
+    server = None
+    if args.server:
+        port = free_port()
+        server = start_server(port, args.workers, env, asgi=args.asgi)
+
+        def new_session(username):
+            return HttpSession("127.0.0.1", port, username)
+    else:
+        def new_session(username):
+            return TestClientSession(fraud_app.app, username)
+
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    per_thread = args.requests // args.concurrency
+    samples = []
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(args.seed + index)
+        session = new_session(usernames[index % len(usernames)])
+        local = []
+        for endpoint in rng.choices(names, weights, k=args.warmup):
+            make_request(session, endpoint, rng)
+        barrier.wait()
+        for endpoint in rng.choices(names, weights, k=per_thread):
+            start = time.perf_counter()
+            status = make_request(session, endpoint, rng)
+            local.append((endpoint, time.perf_counter() - start, status))
+        with lock:
+            samples.extend(local)
+
+    barrier = threading.Barrier(args.concurrency + 1)
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    try:
+        for t in threads:
+            t.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "mode": "server" if args.server else "test_client",
+            "workers": args.workers if args.server else 1,
+            "concurrency": args.concurrency,
+            "requests": per_thread * args.concurrency,
+            "users": args.users,
+            "transactions_per_user": args.transactions,
+            "mix": mix,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "endpoints": summarize(samples, elapsed),
+    }
+    print(json.dumps(report["endpoints"], indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+# ----------------------------------------
+# COMPARE
+# ----------------------------------------
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    regressions = []
+    print(f"{'endpoint':<16}{'metric':<16}{'baseline':>12}{'candidate':>12}{'change':>10}")
+    for endpoint, base in baseline["endpoints"].items():
+        new = candidate["endpoints"].get(endpoint)
+        if new is None:
+            continue
+        for metric, higher_is_better in (("throughput_rps", True), ("p50_ms", False),
+                                         ("p95_ms", False), ("p99_ms", False)):
+            old_value, new_value = base[metric], new[metric]
+            change = (new_value - old_value) / old_value if old_value else 0.0
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > args.threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{endpoint} {metric}")
+            print(f"{endpoint:<16}{metric:<16}{old_value:>12.2f}{new_value:>12.2f}{change:>+10.1%}{flag}")
+        if new["errors"] > base["errors"]:
+            regressions.append(f"{endpoint} errors")
+            print(f"{endpoint:<16}{'errors':<16}{base['errors']:>12}{new['errors']:>12}  REGRESSION")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+# ----------------------------------------
+# CHATBOT MATCHER
+# ----------------------------------------
+# Per-message matching cost as the intent table grows, with synthetic intents
+# added below the real ones. The LRU cache is bypassed so every message is
+# actually scanned.
+# ----------------------------------------
+def chatbot_bench(args):
+    import chatbot
+
+    rng = random.Random(args.seed)
+    messages = [m.lower() for m in CHAT_MESSAGES]
+    messages += ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(60))
+                 for _ in range(len(messages))]
+
+    print(f"{'intents':>8}{'keywords':>10}{'us/message':>12}")
+    for count in (int(n) for n in args.intents.split(",")):
+        intents = list(chatbot.INTENTS)
+        for i in range(max(count - len(intents), 0)):
+            word = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(8))
+            intents.append((f"synthetic_{i}", [word, word + " please"], ""))
+        matcher = chatbot.IntentMatcher(intents)
+        keywords = sum(len(k) for _, k, _ in intents)
+
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            for message in messages:
+                matcher.match(message)
+        per_message = (time.perf_counter() - start) / (args.rounds * len(messages))
+        print(f"{len(intents):>8}{keywords:>10}{per_message * 1e6:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the fraud detection web app.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="seed a database and benchmark the endpoints")
+    run_parser.add_argument("--server", action="store_true",
+                            help="benchmark over HTTP against a multi-worker server instead of the test client")
+    run_parser.add_argument("--workers", type=int, default=4, help="server worker processes (--server)")
+    run_parser.add_argument("--asgi", action="store_true",
+                            help="run the server in ASGI mode (serve.py) instead of WSGI (--server)")
+    run_parser.add_argument("--concurrency", type=int, default=8, help="concurrent client threads")
+    run_parser.add_argument("--requests", type=int, default=2000, help="total measured requests")
+    run_parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per client thread")
+    run_parser.add_argument("--users", type=int, default=20, help="seeded users")
+    run_parser.add_argument("--transactions", type=int, default=1000, help="seeded transactions per user")
+    run_parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint weights, e.g. " + DEFAULT_MIX)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--output", "-o", help="write results JSON here")
+
+    compare_parser = sub.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="relative change counted as a regression (default 0.10)")
+
+    chatbot_parser = sub.add_parser("chatbot", help="micro-benchmark the chatbot intent matcher")
+    chatbot_parser.add_argument("--intents", default="16,100,1000",
+                                help="comma-separated intent table sizes")
+    chatbot_parser.add_argument("--rounds", type=int, default=200, help="passes over the message set")
+    chatbot_parser.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    elif args.command == "chatbot":
+        chatbot_bench(args)
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
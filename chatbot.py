@@ -0,0 +1,154 @@
+# ----------------------------------------
+# CHATBOT INTENT MATCHING
+# ----------------------------------------
+# Intents are checked in priority order: the first intent with any keyword
+# that appears as a substring of the (lower-cased) message wins, exactly like
+# the original if/elif chain. All keywords are compiled once into an
+# Aho-Corasick automaton, so a message is scanned in a single pass whose cost
+# depends on the message length, not on how many intents there are.
+# ----------------------------------------
+from functools import lru_cache
+
+# (name, keywords, response), highest priority first
+INTENTS = [
+    # Greetings
+    ("greeting", ['hello', 'hi', 'hey', 'greetings'],
+     "👋 Hello! I'm your fraud detection assistant. How can I help you today?"),
+
+    # What is fraud detection
+    ("what_is_fraud", ['what is fraud', 'what is fraud detection'],
+     "🔍 **Fraud detection** is the process of identifying suspicious transactions that could be fraudulent. Our system uses machine learning to analyze patterns and flag potential fraud in real-time, helping protect users from financial losses."),
+
+    # How it works
+    ("how_it_works", ['how does it work', 'how it works', 'how do you work'],
+     "⚙️ **How our system works:**\n\n1️⃣ You enter transaction details through the form\n2️⃣ Our ML model analyzes 7 key features\n3️⃣ The system compares patterns against known fraud cases\n4️⃣ You get an instant prediction (Fraudulent/Legitimate)\n5️⃣ All transactions are saved to your dashboard for tracking"),
+
+    # Features analyzed
+    ("features", ['what features', 'what do you analyze', 'what data'],
+     "📊 **Features we analyze:**\n\n• 📅 Step Number (time step)\n• 💳 Transaction Type (PAYMENT, TRANSFER, CASH_OUT, DEBIT, CASH_IN)\n• 💰 Transaction Amount\n• 🏦 Origin Account Old Balance\n• 💵 Origin Account New Balance\n• 🎯 Destination Account Old Balance\n• 💸 Destination Account New Balance"),
+
+    # Accuracy
+    ("accuracy", ['accuracy', 'accurate', 'how reliable'],
+     "🎯 **Accuracy:** Our model has been trained on thousands of transactions and achieves high accuracy in detecting fraudulent patterns. However, no system is 100% perfect. We recommend always reviewing suspicious transactions manually and staying vigilant!"),
+
+    # Data safety
+    ("security", ['data safe', 'data security', 'privacy', 'secure'],
+     "🔒 **Data Security:**\n\n✅ End-to-end encryption\n✅ No storage of sensitive payment info\n✅ Password hashing for accounts\n✅ Regular security updates\n✅ GDPR compliant practices\n\nYour data is protected and only used for fraud detection!"),
+
+    # Transaction types
+    ("transaction_types", ['transaction types', 'types of transactions'],
+     "💳 **Supported Transaction Types:**\n\n• 💳 PAYMENT - Regular payments\n• 🔄 TRANSFER - Money transfers\n• 💵 CASH_OUT - Cash withdrawals\n• 💳 DEBIT - Debit transactions\n• 💰 CASH_IN - Cash deposits\n\nEach type has different fraud patterns!"),
+
+    # Help
+    ("help", ['help'],
+     "❓ **How can I help you?**\n\nYou can ask me about:\n• 🔍 What is fraud detection?\n• ⚙️ How the system works\n• 📊 Features we analyze\n• 🎯 Accuracy of predictions\n• 🔒 Data security\n• 💳 Transaction types\n• 📈 Dashboard features\n• 👤 Profile management\n\nJust type your question!"),
+
+    # Dashboard
+    ("dashboard", ['dashboard', 'statistics', 'stats'],
+     "📈 **Dashboard Features:**\n\n• View transaction history\n• See fraud statistics\n• Interactive charts\n• Achievement badges\n• Real-time updates\n• Transaction search\n\nClick on 'DASHBOARD' in the navigation menu to access it!"),
+
+    # Profile
+    ("profile", ['profile', 'account', 'settings'],
+     "👤 **Profile Management:**\n\n• Update your email\n• Change your full name\n• View member since date\n• Copy user ID\n• Theme preferences\n\nGo to 'PROFILE' in the navigation menu to manage your account!"),
+
+    # Theme
+    ("theme", ['theme', 'dark mode', 'light mode', 'cyber'],
+     "🎨 **Theme Options:**\n\n• 🌙 Dark Theme (default)\n• ☀️ Light Theme\n• 💻 Cyber Theme\n\nClick the theme switcher in the top-right corner to change themes!"),
+
+    # Keyboard shortcuts
+    ("shortcuts", ['keyboard', 'shortcuts', 'hotkeys'],
+     "⌨️ **Keyboard Shortcuts:**\n\n• Ctrl + N - Home\n• Ctrl + D - Dashboard\n• Ctrl + C - Chatbot\n• Ctrl + P - Profile\n• ? - Show help\n• Esc - Close help"),
+
+    # Achievements
+    ("achievements", ['achievement', 'badge', 'trophy'],
+     "🏆 **Achievements:**\n\n• 🔍 First Analysis - Analyze your first transaction\n• 🛡️ Fraud Hunter - Detect 5 frauds\n• 🏆 Expert Analyst - 100 total transactions\n• 🎯 Fraud Detector - Find your first fraud\n\nCheck your progress in the Dashboard!"),
+
+    # Pricing
+    ("pricing", ['price', 'cost', 'free', 'paid'],
+     "💰 **Pricing:**\n\nGood news! Our fraud detection service is completely **FREE**! 🎉\n\n• No subscription fees\n• No hidden costs\n• Unlimited transactions\n• All features included\n\nWe believe in making financial security accessible to everyone!"),
+
+    # Thank you
+    ("thanks", ['thank', 'thanks', 'appreciate'],
+     "🙏 You're welcome! I'm glad I could help. Feel free to ask if you have more questions!"),
+
+    # Bye
+    ("bye", ['bye', 'goodbye', 'see you'],
+     "👋 Goodbye! Feel free to come back if you need help. Stay safe from fraud!"),
+]
+
+DEFAULT_RESPONSE = "🤔 I'm not sure I understand. Try asking about:\n\n• 🔍 Fraud detection\n• ⚙️ How it works\n• 📊 Features\n• 🎯 Accuracy\n• 🔒 Security\n• 💳 Transaction types\n• 📈 Dashboard\n• 👤 Profile\n• 🎨 Themes\n• ⌨️ Shortcuts\n• 🏆 Achievements\n\nOr type 'help' for more options!"
+
+
+class IntentMatcher:
+    def __init__(self, intents):
+        self.intents = list(intents)
+        # Trie with per-node transitions, failure links, and the best (lowest)
+        # intent index of any keyword ending at that node or its suffixes
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]
+        for index, (_, keywords, _) in enumerate(self.intents):
+            for keyword in keywords:
+                self._add(keyword.lower(), index)
+        self._link()
+
+    def _add(self, keyword, index):
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            node = nxt
+        if self._best[node] is None or index < self._best[node]:
+            self._best[node] = index
+
+    def _link(self):
+        # Breadth-first so each node's failure target is finished before it
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                inherited = self._best[self._fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited < self._best[child]):
+                    self._best[child] = inherited
+                queue.append(child)
+
+    def match(self, message):
+        # Index of the highest-priority intent found in message, or None
+        goto, fail, best_at = self._goto, self._fail, self._best
+        node = 0
+        best = None
+        for ch in message:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            found = best_at[node]
+            if found is not None and (best is None or found < best):
+                best = found
+                if best == 0:
+                    break
+        return best
+
+    def respond(self, message, default=None):
+        index = self.match(message)
+        return default if index is None else self.intents[index][2]
+
+
+matcher = IntentMatcher(INTENTS)
+
+
+@lru_cache(maxsize=4096)
+def _cached_response(normalized):
+    return matcher.respond(normalized, DEFAULT_RESPONSE)
+
+
+def generate_chatbot_response(message):
+    return _cached_response(message.lower().strip())
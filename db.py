@@ -0,0 +1,253 @@
+# ----------------------------------------
+# SQLITE CONNECTION MANAGEMENT
+# ----------------------------------------
+# One shared pool of long-lived connections instead of a fresh
+# sqlite3.connect() per request. Every connection runs in WAL mode (readers
+# don't block the writer) with a bounded busy timeout, so concurrent writes
+# wait for the lock instead of failing with "database is locked". Connections
+# are reused, so sqlite3's per-connection statement cache keeps the handlers'
+# queries prepared across requests.
+# ----------------------------------------
+import base64
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get("FRAUD_DB_PATH", "users.db")
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "16"))
+BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", "5000"))
+CACHE_SIZE_KB = int(os.environ.get("DB_CACHE_SIZE_KB", "20000"))
+STATEMENT_CACHE = 256
+
+# Applied to every connection (also the asyncio ones in asgi.py)
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    # NORMAL is durable across application crashes in WAL mode; only an OS
+    # crash/power loss can drop the last commits
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA cache_size=-{CACHE_SIZE_KB}",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+]
+
+
+def connect(path=DB_PATH):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000,
+                           check_same_thread=False, cached_statements=STATEMENT_CACHE)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ConnectionPool:
+    def __init__(self, path=DB_PATH, size=POOL_SIZE, acquire_timeout=BUSY_TIMEOUT_MS / 1000):
+        self.path = path
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return connect(self.path)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a database connection")
+
+    def release(self, conn):
+        if conn is None:
+            return
+        try:
+            # Never hand out a connection with a half-finished transaction
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+# ----------------------------------------
+# KEYSET PAGINATION
+# ----------------------------------------
+# History is paged newest-first on (timestamp, id). A page continues from the
+# key of the previous page's last row instead of an OFFSET, so the index seek
+# costs the same on page 1000 as on page 1. The cursor handed to clients is
+# that key, base64-encoded.
+# ----------------------------------------
+def encode_cursor(timestamp, row_id):
+    raw = json.dumps([timestamp, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, row_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(timestamp, str) or not isinstance(row_id, int):
+        raise ValueError("Invalid cursor")
+    return timestamp, row_id
+
+
+def keyset_page(conn, select, where, params, cursor=None, limit=50):
+    # select must end with the "timestamp, id" columns; returns (rows, next_cursor)
+    where = list(where)
+    params = list(params)
+    if cursor:
+        where.append("(timestamp, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    sql = f"{select} WHERE {' AND '.join(where)} ORDER BY timestamp DESC, id DESC LIMIT ?"
+    rows = conn.execute(sql, params + [limit + 1]).fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+    return rows, next_cursor
+
+
+@contextmanager
+def read_snapshot(conn):
+    # Groups several SELECTs into one read transaction. In WAL mode it keeps the
+    # snapshot its first read saw, so a writer committing in between is seen
+    # either fully or not at all.
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.commit()
+
+
+# ----------------------------------------
+# WRITE-BEHIND QUEUE
+# ----------------------------------------
+# Optional asynchronous persistence. Handlers enqueue statements and return;
+# a background thread commits them in batches (by size or age), so the
+# request latency no longer includes the commit/fsync. Each queued item is a
+# list of (sql, params) statements that belong together; params given as a
+# list are run with executemany. close() drains whatever is still queued.
+# ----------------------------------------
+def execute_statements(conn, statements):
+    for sql, params in statements:
+        if isinstance(params, list):
+            conn.executemany(sql, params)
+        else:
+            conn.execute(sql, params)
+
+
+class WriteBehindQueue:
+    def __init__(self, path=DB_PATH, max_size=10000, batch_size=500, flush_interval=0.05,
+                 on_flush=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # on_flush(items, seconds) is called after every batch, e.g. to record metrics
+        self.on_flush = on_flush
+        self._queue = queue.Queue(maxsize=max_size)
+        self._stop = threading.Event()
+        self.flushed = 0
+        self.failed = 0
+        self.last_flush_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, statements):
+        # False when the queue is full (or closed); the caller should write synchronously
+        if self._stop.is_set():
+            return False
+        try:
+            self._queue.put_nowait(statements)
+            return True
+        except queue.Full:
+            return False
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _take_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _flush(self, conn, batch):
+        start = time.perf_counter()
+        try:
+            with conn:
+                for statements in batch:
+                    execute_statements(conn, statements)
+        except sqlite3.Error as e:
+            # Retry one by one so a single bad item doesn't lose the whole batch
+            print(f"Write-behind batch error: {e}")
+            for statements in batch:
+                try:
+                    with conn:
+                        execute_statements(conn, statements)
+                except sqlite3.Error as item_error:
+                    self.failed += 1
+                    print(f"Write-behind dropped item: {item_error}")
+        self.last_flush_seconds = time.perf_counter() - start
+        self.flushed += len(batch)
+        if self.on_flush is not None:
+            self.on_flush(len(batch), self.last_flush_seconds)
+
+    def _run(self):
+        conn = connect(self.path)
+        try:
+            while not (self._stop.is_set() and self._queue.empty()):
+                batch = self._take_batch()
+                if batch:
+                    self._flush(conn, batch)
+        finally:
+            conn.close()
+
+    def close(self, timeout=30.0):
+        self._stop.set()
+        self._thread.join(timeout)
@@ -0,0 +1,137 @@
+# ----------------------------------------
+# FEATURE ENCODING
+# ----------------------------------------
+# The one place where raw PaySim transactions become model inputs, shared by
+# training.py, score.py and app.py. A FeatureTransformer is fitted once at
+# training time, saved as <model>.features.json next to the model, and applied
+# vectorized to whole DataFrames (training / offline scoring) or to lists of
+# request rows (serving).
+#
+# Transaction types are encoded in sorted order, which is what the
+# LabelEncoder used by earlier training runs produced (CASH_IN=0, CASH_OUT=1,
+# DEBIT=2, PAYMENT=3, TRANSFER=4).
+# ----------------------------------------
+import json
+import os
+
+import numpy as np
+
+FEATURE_VERSION = 2
+
+RAW_COLUMNS = ["step", "type", "amount",
+               "oldbalanceOrg", "newbalanceOrig",
+               "oldbalanceDest", "newbalanceDest"]
+NUMERIC_COLUMNS = [c for c in RAW_COLUMNS if c != "type"]
+
+# Engineered balance-error features: money that appears or disappears on each
+# side of the transaction (non-zero values are a strong fraud signal)
+ENGINEERED_COLUMNS = ["errorBalanceOrig", "errorBalanceDest"]
+
+TRANSACTION_TYPES = ["CASH_IN", "CASH_OUT", "DEBIT", "PAYMENT", "TRANSFER"]
+
+FEATURES_FILE = "features.json"
+
+
+def numeric_matrix(rows):
+    # (N, 6) float matrix of NUMERIC_COLUMNS from a list of dict-like rows
+    numeric = np.empty((len(rows), len(NUMERIC_COLUMNS)), dtype=np.float64)
+    for j, column in enumerate(NUMERIC_COLUMNS):
+        numeric[:, j] = [float(row[column]) for row in rows]
+    return numeric
+
+
+def normalize_types(rows):
+    return [str(row["type"]).strip().upper() for row in rows]
+
+
+class FeatureTransformer:
+    def __init__(self, type_categories=TRANSACTION_TYPES, engineered=True, version=FEATURE_VERSION):
+        self.type_categories = sorted(type_categories)
+        self.engineered = engineered
+        self.version = version
+        self._categories = np.array(self.type_categories)
+
+    @classmethod
+    def fit(cls, df, engineered=True):
+        # Known types are always included, so codes don't shift when a sample lacks one
+        observed = set(df["type"].astype(str).unique())
+        return cls(sorted(observed | set(TRANSACTION_TYPES)), engineered=engineered)
+
+    @classmethod
+    def legacy(cls):
+        # Seven raw features, as used by model/payments.pkl and older registry versions
+        return cls(TRANSACTION_TYPES, engineered=False, version=1)
+
+    @property
+    def feature_names(self):
+        return RAW_COLUMNS + (ENGINEERED_COLUMNS if self.engineered else [])
+
+    @property
+    def type_encoding(self):
+        return {name: code for code, name in enumerate(self.type_categories)}
+
+    def encode_types(self, types):
+        types = np.asarray(types, dtype=str)
+        codes = np.searchsorted(self._categories, types)
+        codes = np.minimum(codes, len(self._categories) - 1)
+        unknown = self._categories[codes] != types
+        if unknown.any():
+            raise ValueError(f"Unknown transaction types: {sorted(set(types[unknown].tolist()))}")
+        return codes
+
+    def transform_arrays(self, numeric, types):
+        # numeric: (N, 6) in NUMERIC_COLUMNS order; types: N type names
+        numeric = np.asarray(numeric, dtype=np.float64)
+        step, amount, old_org, new_orig, old_dest, new_dest = numeric.T
+        columns = [step, self.encode_types(types), amount, old_org, new_orig, old_dest, new_dest]
+        if self.engineered:
+            columns.append(old_org - amount - new_orig)
+            columns.append(old_dest + amount - new_dest)
+        return np.column_stack(columns).astype(np.float64)
+
+    def transform(self, df):
+        return self.transform_arrays(df[NUMERIC_COLUMNS].to_numpy(dtype=np.float64),
+                                     df["type"].astype(str).to_numpy())
+
+    def transform_rows(self, rows):
+        return self.transform_arrays(numeric_matrix(rows), normalize_types(rows))
+
+    # ---- serialization ----
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "type_categories": self.type_categories,
+            "engineered": self.engineered,
+            "feature_names": self.feature_names,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["type_categories"], engineered=data["engineered"], version=data["version"])
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def features_path(model_path):
+    # model/payments.pkl -> model/payments.features.json
+    return os.path.splitext(model_path)[0] + ".features.json"
+
+
+def save_for_model(transformer, model_path):
+    transformer.save(features_path(model_path))
+
+
+def load_for_model(model_path):
+    # The encoding saved with this model pickle, or the legacy one for models without it
+    path = features_path(model_path)
+    if os.path.exists(path):
+        return FeatureTransformer.load(path)
+    return FeatureTransformer.legacy()
@@ -0,0 +1,311 @@
+# ----------------------------------------
+# BACKGROUND SCORING JOBS
+# ----------------------------------------
+# Uploaded CSVs (PaySim column layout) are saved to disk and scored off the
+# request thread. A small thread pool runs one job per thread: the file is
+# read in chunks, each chunk is scored with one vectorized model call, and its
+# rows are committed in a single transaction together with the job's progress.
+# The whole file is validated before the first chunk is committed, so a bad row
+# fails the job without importing part of the file.
+#
+# Each server process refreshes updated_at of the jobs it holds every
+# SCORING_JOB_HEARTBEAT_SECONDS. A queued or running job not refreshed for
+# four heartbeats was left behind by a process that stopped (restart, deploy,
+# crash): queued jobs whose upload is still there are taken over and run,
+# interrupted running jobs are marked failed, and their uploads are deleted.
+# Progress lives in the scoring_jobs table, so any server process can answer a
+# status request. Predictions are also appended to a results CSV that can be
+# downloaded while the job is still running.
+# ----------------------------------------
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import db
+from features import NUMERIC_COLUMNS, RAW_COLUMNS
+
+UPLOAD_DIR = os.environ.get("UPLOAD_DIR", "uploads")
+JOB_WORKERS = int(os.environ.get("SCORING_JOB_WORKERS", "2"))
+JOB_CHUNK_ROWS = int(os.environ.get("SCORING_JOB_CHUNK_ROWS", "50000"))
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("SCORING_JOB_HEARTBEAT_SECONDS", "30"))
+
+JOB_COLUMNS = ["id", "user_id", "filename", "status", "rows_total", "rows_done", "fraud_count",
+               "model_version", "error", "created_at", "started_at", "updated_at", "finished_at"]
+
+
+def count_rows(path):
+    # Data rows in a CSV file (lines minus the header), without parsing it
+    lines = 0
+    last = b"\n"
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def prepare_chunk(chunk, transformer):
+    # Checks one chunk and normalizes its types in place; raises ValueError on bad rows
+    missing = [c for c in RAW_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    chunk["type"] = chunk["type"].astype(str).str.strip().str.upper()
+    transformer.encode_types(chunk["type"].to_numpy())
+    try:
+        numeric = chunk[NUMERIC_COLUMNS].to_numpy(dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError(f"Non-numeric values in {', '.join(NUMERIC_COLUMNS)}")
+    if np.isnan(numeric).any():
+        raise ValueError(f"Empty values in {', '.join(NUMERIC_COLUMNS)}")
+    if (numeric[:, 1:] < 0).any():
+        raise ValueError("Amounts and balances cannot be negative")
+    return chunk
+
+
+class ScoringJobs:
+    def __init__(self, pool, models, chunk_statements, threshold, upload_dir=UPLOAD_DIR,
+                 workers=JOB_WORKERS, chunksize=JOB_CHUNK_ROWS, heartbeat=JOB_HEARTBEAT_SECONDS):
+        # chunk_statements(user_id, chunk, scores, predictions, model_version) -> [(sql, params)]
+        # threshold() -> current fraud probability threshold
+        self.pool = pool
+        self.models = models
+        self.chunk_statements = chunk_statements
+        self.threshold = threshold
+        self.upload_dir = upload_dir
+        self.chunksize = chunksize
+        self.heartbeat = heartbeat
+        self.stale_after = heartbeat * 4
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scoring-job")
+        # Ids of the queued or running jobs this process is responsible for
+        self._held = set()
+        self._held_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._maintain, name="scoring-job-heartbeat", daemon=True)
+        self._thread.start()
+
+    def input_path(self, job_id):
+        return os.path.join(self.upload_dir, f"{job_id}.csv")
+
+    def results_path(self, job_id):
+        return os.path.join(self.upload_dir, f"{job_id}-results.csv")
+
+    def submit(self, user_id, filename, stream):
+        # Saves the upload and queues it; returns the new job id
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.upload_dir, exist_ok=True)
+        path = self.input_path(job_id)
+        with open(path + ".part", "wb") as f:
+            shutil.copyfileobj(stream, f, 1 << 20)
+        os.replace(path + ".part", path)
+
+        conn = self.pool.acquire()
+        try:
+            with conn:
+                conn.execute("""INSERT INTO scoring_jobs (id, user_id, filename, status, created_at)
+                                VALUES (?, ?, ?, 'queued', ?)""", (job_id, user_id, filename, time.time()))
+        finally:
+            self.pool.release(conn)
+
+        self._start(job_id, user_id)
+        return job_id
+
+    def _start(self, job_id, user_id):
+        with self._held_lock:
+            self._held.add(job_id)
+        self._executor.submit(self._run, job_id, user_id)
+
+    def get(self, job_id, user_id):
+        conn = self.pool.acquire()
+        try:
+            row = conn.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM scoring_jobs WHERE id = ? AND user_id = ?",
+                               (job_id, user_id)).fetchone()
+        finally:
+            self.pool.release(conn)
+        return self._describe(row) if row else None
+
+    def list(self, user_id, limit=20):
+        conn = self.pool.acquire()
+        try:
+            rows = conn.execute(f"""SELECT {', '.join(JOB_COLUMNS)} FROM scoring_jobs
+                                    WHERE user_id = ? ORDER BY created_at DESC LIMIT ?""",
+                                (user_id, limit)).fetchall()
+        finally:
+            self.pool.release(conn)
+        return [self._describe(row) for row in rows]
+
+    @staticmethod
+    def _describe(row):
+        job = dict(zip(JOB_COLUMNS, row))
+        elapsed = (job["updated_at"] or 0) - (job["started_at"] or 0)
+        job["progress"] = round(job["rows_done"] / job["rows_total"], 4) if job["rows_total"] else 0.0
+        job["rows_per_second"] = round(job["rows_done"] / elapsed, 1) if elapsed > 0 else 0.0
+        return job
+
+    def close(self):
+        # Jobs still queued here are taken over by another process (or the next start)
+        self._closed.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---- heartbeat and recovery ----
+
+    def _maintain(self):
+        while not self._closed.is_set():
+            try:
+                self.recover()
+                self._touch_held()
+            except Exception as e:
+                print(f"Scoring job heartbeat error: {e}")
+            self._closed.wait(self.heartbeat)
+
+    def _touch_held(self):
+        with self._held_lock:
+            held = list(self._held)
+        if not held:
+            return
+        now = time.time()
+        conn = self.pool.acquire()
+        try:
+            with conn:
+                conn.executemany("""UPDATE scoring_jobs SET updated_at = ?
+                                    WHERE id = ? AND status IN ('queued', 'running')""",
+                                 [(now, job_id) for job_id in held])
+        finally:
+            self.pool.release(conn)
+
+    def recover(self):
+        # Takes over or fails jobs whose process stopped; returns how many were handled
+        cutoff = time.time() - self.stale_after
+        conn = self.pool.acquire()
+        handled = 0
+        try:
+            stale = conn.execute("""SELECT id, user_id, status, rows_done FROM scoring_jobs
+                                    WHERE status IN ('queued', 'running')
+                                    AND COALESCE(updated_at, created_at) < ?""", (cutoff,)).fetchall()
+            for job_id, user_id, status, rows_done in stale:
+                path = self.input_path(job_id)
+                resume = status == "queued" and os.path.exists(path)
+                now = time.time()
+                # Conditional on still being stale, so only one recovering process wins
+                with conn:
+                    if resume:
+                        claimed = conn.execute("""UPDATE scoring_jobs SET updated_at = ?
+                                                  WHERE id = ? AND status = 'queued'
+                                                  AND COALESCE(updated_at, created_at) < ?""",
+                                               (now, job_id, cutoff)).rowcount
+                    else:
+                        if status == "running":
+                            error = "Interrupted by a server restart"
+                            if rows_done:
+                                error += f" ({rows_done} rows were imported before it stopped)"
+                        else:
+                            error = "Upload lost in a server restart"
+                        claimed = conn.execute("""UPDATE scoring_jobs SET status = 'failed', error = ?,
+                                                  updated_at = ?, finished_at = ?
+                                                  WHERE id = ? AND status = ?
+                                                  AND COALESCE(updated_at, created_at) < ?""",
+                                               (error, now, now, job_id, status, cutoff)).rowcount
+                if not claimed:
+                    continue
+                handled += 1
+                if resume:
+                    print(f"Resuming queued scoring job {job_id}")
+                    self._start(job_id, user_id)
+                else:
+                    print(f"Scoring job {job_id} was left {status} by a stopped server; marked failed")
+                    if os.path.exists(path):
+                        os.remove(path)
+            self._remove_orphans(conn, cutoff)
+        finally:
+            self.pool.release(conn)
+        return handled
+
+    def _remove_orphans(self, conn, cutoff):
+        # Uploads (and partial uploads) that no queued or running job will read
+        if not os.path.isdir(self.upload_dir):
+            return
+        active = {row[0] for row in conn.execute(
+            "SELECT id FROM scoring_jobs WHERE status IN ('queued', 'running')")}
+        for filename in os.listdir(self.upload_dir):
+            if not (filename.endswith(".csv") or filename.endswith(".csv.part")) or "-results" in filename:
+                continue
+            path = os.path.join(self.upload_dir, filename)
+            # Recent files may belong to an upload whose job row isn't committed yet
+            if filename.split(".", 1)[0] not in active and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
+    # ---- worker side ----
+
+    def _run(self, job_id, user_id):
+        # pandas is imported by the first job, not on every server start
+        import pandas as pd
+        from score import PASSTHROUGH_COLUMNS, ResultWriter
+
+        path = self.input_path(job_id)
+        writer = ResultWriter(self.results_path(job_id))
+        conn = self.pool.acquire()
+        rows_saved = 0
+        try:
+            # One model version for the whole job, even if the server hot-swaps meanwhile
+            active = self.models.current()
+            with conn:
+                conn.execute("""UPDATE scoring_jobs SET status = 'running', rows_total = ?, model_version = ?,
+                                started_at = ?, updated_at = ? WHERE id = ?""",
+                             (count_rows(path), active.version, time.time(), time.time(), job_id))
+
+            # Validation pass: nothing is committed unless every row can be scored
+            for index, chunk in enumerate(pd.read_csv(path, chunksize=self.chunksize)):
+                try:
+                    prepare_chunk(chunk, active.transformer)
+                except ValueError as e:
+                    raise ValueError(f"{e} (rows {index * self.chunksize + 1}-"
+                                     f"{index * self.chunksize + len(chunk)}); nothing was imported")
+
+            for chunk in pd.read_csv(path, chunksize=self.chunksize):
+                prepare_chunk(chunk, active.transformer)
+                scores = active.scorer.fraud_probability(active.transformer.transform(chunk))
+                predictions = (scores > self.threshold()).astype(np.int64)
+                fraud_count = int((predictions == 1).sum())
+
+                # The chunk's rows and the job's progress commit together
+                with conn:
+                    db.execute_statements(conn, self.chunk_statements(user_id, chunk, scores, predictions,
+                                                                      active.version))
+                    conn.execute("""UPDATE scoring_jobs SET rows_done = rows_done + ?,
+                                    fraud_count = fraud_count + ?, updated_at = ? WHERE id = ?""",
+                                 (len(chunk), fraud_count, time.time(), job_id))
+                rows_saved += len(chunk)
+
+                out = chunk[[c for c in PASSTHROUGH_COLUMNS if c in chunk.columns]].copy()
+                out["fraud_score"] = scores
+                out["prediction"] = predictions.astype(np.int8)
+                writer.write(out)
+
+            self._finish(conn, job_id, "done", None)
+        except Exception as e:
+            error = str(e)
+            if rows_saved:
+                # e.g. the database failed mid-import: say what was kept
+                error += f" ({rows_saved} rows were imported before the failure)"
+            print(f"Scoring job {job_id} failed: {error}")
+            self._finish(conn, job_id, "failed", error)
+        finally:
+            writer.close()
+            self.pool.release(conn)
+            if os.path.exists(path):
+                os.remove(path)
+            with self._held_lock:
+                self._held.discard(job_id)
+
+    @staticmethod
+    def _finish(conn, job_id, status, error):
+        now = time.time()
+        with conn:
+            conn.execute("""UPDATE scoring_jobs SET status = ?, error = ?, updated_at = ?, finished_at = ?
+                            WHERE id = ?""", (status, error, now, now, job_id))
@@ -0,0 +1,121 @@
+# ----------------------------------------
+# PASSWORD HASHING
+# ----------------------------------------
+# scrypt/PBKDF2 are deliberately CPU-heavy. Hashing in the request threads
+# would let a burst of logins take every core from /predict. Hashes are
+# therefore computed in a small, dedicated process pool, so password work
+# never gets more than PASSWORD_HASH_WORKERS cores. Those workers run at a
+# lower scheduling priority (PASSWORD_HASH_NICE), so scoring wins when CPUs
+# are contended. At most PASSWORD_HASH_MAX_PENDING hashes may be queued or
+# running per server process. Past that, hash() and verify() raise
+# PasswordPoolFull right away (the routes answer 429) instead of queueing
+# without bound.
+#
+# The cost is set by PASSWORD_HASH_METHOD, in werkzeug's method syntax
+# ("scrypt:32768:8:1", "pbkdf2:sha256:600000"). Stored hashes carry the
+# method they were made with. A hash made with other parameters is replaced
+# on the user's next successful login.
+# ----------------------------------------
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "16"))
+PASSWORD_HASH_NICE = int(os.environ.get("PASSWORD_HASH_NICE", "10"))
+
+
+class PasswordPoolFull(Exception):
+    pass
+
+
+def canonical_method(method):
+    # The method prefix werkzeug writes into the hash, e.g. "scrypt" -> "scrypt:32768:8:1"
+    name, *params = method.split(":")
+    if name == "scrypt" and not params:
+        return "scrypt:32768:8:1"
+    if name == "pbkdf2" and len(params) < 2:
+        return f"pbkdf2:{params[0] if params else 'sha256'}:{DEFAULT_PBKDF2_ITERATIONS}"
+    return method
+
+
+class PasswordHasher:
+    def __init__(self, method=PASSWORD_HASH_METHOD, workers=PASSWORD_HASH_WORKERS,
+                 max_pending=PASSWORD_HASH_MAX_PENDING, on_hash=None):
+        # workers=0 hashes in the calling thread (no pool, no admission control)
+        # on_hash(operation, seconds) is called after every hash, e.g. for metrics
+        self.method = canonical_method(method)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.on_hash = on_hash
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def pending(self):
+        return self._pending
+
+    def hash(self, password):
+        return self._run("hash", generate_password_hash, password, self.method)
+
+    def verify(self, stored, password):
+        return self._run("verify", check_password_hash, stored, password)
+
+    def needs_rehash(self, stored):
+        return stored.split("$", 1)[0] != self.method
+
+    def _run(self, operation, fn, *args):
+        start = time.perf_counter()
+        if self.workers <= 0:
+            result = fn(*args)
+        else:
+            if not self._slots.acquire(blocking=False):
+                raise PasswordPoolFull()
+            with self._lock:
+                self._pending += 1
+            try:
+                result = self._call(fn, args)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                self._slots.release()
+        if self.on_hash is not None:
+            self.on_hash(operation, time.perf_counter() - start)
+        return result
+
+    def _call(self, fn, args):
+        for _ in range(2):
+            pool = self._executor()
+            try:
+                return pool.submit(fn, *args).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed): replace the pool and retry once
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = None
+                pool.shutdown(wait=False)
+        # Still broken: the routes answer 429, like a full pool
+        raise PasswordPoolFull()
+
+    def _executor(self):
+        # Created on first use, so each server worker process gets its own pool.
+        # That happens in a request thread, and fork() would copy this process's
+        # other threads' held locks (DB pool, batcher, model watcher), so workers
+        # start from a clean forkserver process instead.
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("forkserver"),
+                                                 initializer=os.nice, initargs=(PASSWORD_HASH_NICE,))
+            return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
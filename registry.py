@@ -0,0 +1,217 @@
+# ----------------------------------------
+# MODEL REGISTRY
+# ----------------------------------------
+# Versioned model store used by training.py (publish) and app.py (serve).
+#
+#   model/registry/<version>/model.pkl
+#   model/registry/<version>/mmap/           (memory-mapped scorer, see scorers.py)
+#   model/registry/<version>/features.json   (fitted FeatureTransformer)
+#   model/registry/<version>/metadata.json   (feature order, type encoding,
+#                                              metrics, calibration, sha256
+#                                              of model.pkl)
+#
+# Versions are named so that they sort by creation time. The app keeps the
+# active model in a ModelHolder, which loads and warms new versions in a
+# background thread and swaps them in with a single reference assignment, so
+# requests that already grabbed the old model keep using it.
+# ----------------------------------------
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+from features import FEATURES_FILE, FeatureTransformer, load_for_model
+from scorers import Calibration, file_source, load_calibration, load_mmap, make_scorer, mmap_path, save_mmap
+
+REGISTRY_DIR = os.path.join("model", "registry")
+MMAP_DIR = "mmap"
+
+ActiveModel = namedtuple("ActiveModel", ["scorer", "transformer", "version", "metadata"])
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def publish(model, name, transformer, metrics=None, calibration=None, registry_dir=REGISTRY_DIR):
+    payload = pickle.dumps(model)
+    digest = hashlib.sha256(payload).hexdigest()
+    calibration = calibration.to_dict() if calibration is not None else None
+
+    # Re-publishing an identical model (e.g. a fully cached training run) is a no-op
+    latest = latest_version(registry_dir)
+    if latest is not None:
+        with open(os.path.join(registry_dir, latest, "metadata.json")) as f:
+            latest_metadata = json.load(f)
+        if latest_metadata.get("sha256") == digest and latest_metadata.get("calibration") == calibration:
+            return latest
+
+    version = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{digest[:8]}"
+    path = os.path.join(registry_dir, version)
+    tmp_path = path + ".tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+
+    with open(os.path.join(tmp_path, "model.pkl"), "wb") as f:
+        f.write(payload)
+    save_mmap(make_scorer(model), os.path.join(tmp_path, MMAP_DIR), digest)
+    transformer.save(os.path.join(tmp_path, FEATURES_FILE))
+    metadata = {
+        "version": version,
+        "name": name,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "feature_version": transformer.version,
+        "feature_order": transformer.feature_names,
+        "type_encoding": transformer.type_encoding,
+        "metrics": metrics or {},
+        "calibration": calibration,
+        "sha256": digest,
+    }
+    with open(os.path.join(tmp_path, "metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    # Rename last so a watcher never sees a half-written version
+    os.replace(tmp_path, path)
+    return version
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(v for v in os.listdir(registry_dir)
+                  if not v.endswith(".tmp") and os.path.isfile(os.path.join(registry_dir, v, "metadata.json")))
+
+
+def latest_version(registry_dir=REGISTRY_DIR):
+    versions = list_versions(registry_dir)
+    return versions[-1] if versions else None
+
+
+def load_version(version, registry_dir=REGISTRY_DIR):
+    path = os.path.join(registry_dir, version)
+    with open(os.path.join(path, "metadata.json")) as f:
+        metadata = json.load(f)
+    scorer = load_mmap(os.path.join(path, MMAP_DIR), metadata["sha256"])
+    if scorer is None:
+        # Published before the mmap format: convert once, later loads map it
+        model_path = os.path.join(path, "model.pkl")
+        if _sha256(model_path) != metadata["sha256"]:
+            raise ValueError(f"Hash mismatch for model version {version}")
+        with open(model_path, "rb") as f:
+            scorer = make_scorer(pickle.load(f))
+        convert_mmap(scorer, os.path.join(path, MMAP_DIR), metadata["sha256"])
+    calibration = metadata.get("calibration")
+    scorer.calibration = Calibration.from_dict(calibration) if calibration else None
+    features_path = os.path.join(path, FEATURES_FILE)
+    if os.path.exists(features_path):
+        transformer = FeatureTransformer.load(features_path)
+    else:
+        # Versions published before features.json: raw features, recorded type encoding
+        encoding = metadata["type_encoding"]
+        transformer = FeatureTransformer(sorted(encoding, key=encoding.get), engineered=False, version=1)
+    return ActiveModel(scorer, transformer, version, metadata)
+
+
+def load_file(path, version="legacy", metadata=None):
+    source = file_source(path)
+    scorer = load_mmap(mmap_path(path), source)
+    if scorer is None:
+        with open(path, "rb") as f:
+            scorer = make_scorer(pickle.load(f))
+        convert_mmap(scorer, mmap_path(path), source)
+    scorer.calibration = load_calibration(path)
+    return ActiveModel(scorer, load_for_model(path), version, metadata or {})
+
+
+def convert_mmap(scorer, directory, source):
+    # Best effort: a read-only model directory just means every start unpickles
+    try:
+        save_mmap(scorer, directory, source)
+        print(f"Saved memory-mapped model to {directory}")
+    except OSError as e:
+        print(f"Could not save memory-mapped model to {directory}: {e}")
+
+
+def warm(active, sizes=(1, 16, 256)):
+    # A few dummy predictions so the first real request doesn't pay for lazy setup
+    n_features = len(active.transformer.feature_names)
+    for size in sizes:
+        active.scorer.fraud_probability(np.zeros((size, n_features)))
+
+
+class ModelHolder:
+    def __init__(self, active, registry_dir=REGISTRY_DIR):
+        self._active = active
+        self.registry_dir = registry_dir
+        self._reload_lock = threading.Lock()
+        self.last_error = None
+        self._failed_version = None
+        self._swap_callbacks = []
+
+    def on_swap(self, callback):
+        # callback(active) runs after every successful swap
+        self._swap_callbacks.append(callback)
+
+    def current(self):
+        # Callers should fetch this once per request and use that snapshot
+        return self._active
+
+    def swap_to(self, version):
+        # Load, verify and warm outside the serving path, then swap atomically
+        with self._reload_lock:
+            if version == self._active.version:
+                return False
+            try:
+                active = load_version(version, self.registry_dir)
+                warm(active)
+            except Exception as e:
+                self._failed_version = version
+                self.last_error = f"{version}: {e}"
+                print(f"Model reload error: {self.last_error}")
+                raise
+            self._active = active
+            self.last_error = None
+            print(f"Serving model version {version}")
+        for callback in self._swap_callbacks:
+            callback(active)
+        return True
+
+    def swap_async(self, version=None):
+        version = version or latest_version(self.registry_dir)
+        if version is None:
+            return None
+
+        def run():
+            try:
+                self.swap_to(version)
+            except Exception:
+                pass
+
+        thread = threading.Thread(target=run, name="model-reload", daemon=True)
+        thread.start()
+        return version
+
+    def watch(self, interval=30.0):
+        # Poll the registry and pick up newly published versions
+        def run():
+            while True:
+                time.sleep(interval)
+                latest = latest_version(self.registry_dir)
+                if latest and latest not in (self._active.version, self._failed_version):
+                    try:
+                        self.swap_to(latest)
+                    except Exception:
+                        pass
+
+        thread = threading.Thread(target=run, name="model-watch", daemon=True)
+        thread.start()
+        return thread
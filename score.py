@@ -0,0 +1,152 @@
+# ----------------------------------------
+# OFFLINE BATCH SCORER
+# ----------------------------------------
+# Scores a PaySim-format CSV with the saved model, reading it in fixed-size
+# chunks so memory is bounded by --chunksize instead of the file size.
+# Rows are scored like the web app does: the model's calibrated fraud score,
+# flagged above the fraud threshold stored in users.db (app_settings), so the
+# CLI and /api/predict agree on every transaction.
+#
+#   python score.py --output predictions.csv --workers 4
+#   python score.py data/other_log.csv --output predictions.parquet
+# ----------------------------------------
+import argparse
+import os
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import db
+from features import load_for_model
+from scorers import load_scorer
+
+DEFAULT_INPUT = "data/PS_20174392719_1491204439457_log.csv"
+DEFAULT_MODEL = "model/payments.pkl"
+
+# Used when users.db has no threshold set, same default as app.py
+DEFAULT_FRAUD_THRESHOLD = float(os.environ.get("FRAUD_THRESHOLD", "0.5"))
+
+# Columns carried through to the output next to the prediction
+PASSTHROUGH_COLUMNS = ["step", "type", "amount", "nameOrig", "nameDest", "isFraud"]
+
+_scorer = None
+_transformer = None
+_threshold = DEFAULT_FRAUD_THRESHOLD
+
+
+def stored_threshold(db_path=db.DB_PATH):
+    # The threshold admins set at runtime (POST /admin/threshold), read-only
+    if not os.path.exists(db_path):
+        return DEFAULT_FRAUD_THRESHOLD
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM app_settings WHERE key = 'fraud_threshold'").fetchone()
+    except sqlite3.OperationalError:
+        row = None  # database from before app_settings
+    finally:
+        conn.close()
+    return float(row[0]) if row else DEFAULT_FRAUD_THRESHOLD
+
+
+def _load_worker_model(model_path, threshold):
+    # The model with its calibration and feature encoding (<model>.features.json), same as app.py
+    global _scorer, _transformer, _threshold
+    _scorer = load_scorer(model_path)
+    _transformer = load_for_model(model_path)
+    _threshold = threshold
+
+
+def score_chunk(chunk):
+    scores = _scorer.fraud_probability(_transformer.transform(chunk))
+    out = chunk[[c for c in PASSTHROUGH_COLUMNS if c in chunk.columns]].copy()
+    out["fraud_score"] = scores
+    out["prediction"] = (scores > _threshold).astype(np.int8)
+    return out
+
+
+class ResultWriter:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self._writer = None
+        self._header = True
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a", header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def run(input_path, output_path, model_path, chunksize, workers, threshold):
+    reader = pd.read_csv(input_path, chunksize=chunksize)
+    writer = ResultWriter(output_path)
+    rows = 0
+    frauds = 0
+    start = time.time()
+
+    def record(result):
+        nonlocal rows, frauds
+        writer.write(result)
+        rows += len(result)
+        frauds += int(result["prediction"].sum())
+        print(f"Scored {rows:,} rows ({rows / (time.time() - start):,.0f} rows/s)")
+
+    try:
+        if workers <= 1:
+            _load_worker_model(model_path, threshold)
+            for chunk in reader:
+                record(score_chunk(chunk))
+        else:
+            # Keep at most 2 chunks per worker in flight so memory stays bounded
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_load_worker_model,
+                                     initargs=(model_path, threshold)) as pool:
+                for chunk in reader:
+                    pending.append(pool.submit(score_chunk, chunk))
+                    if len(pending) >= workers * 2:
+                        record(pending.popleft().result())
+                while pending:
+                    record(pending.popleft().result())
+    finally:
+        writer.close()
+
+    print(f"\nDone: {rows:,} rows, {frauds:,} flagged as fraud, "
+          f"{time.time() - start:.1f}s -> {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a PaySim CSV with the saved fraud model.")
+    parser.add_argument("input", nargs="?", default=DEFAULT_INPUT, help="input CSV in PaySim column layout")
+    parser.add_argument("--output", "-o", default="predictions.csv",
+                        help="output file; .parquet writes Parquet (needs pyarrow), anything else CSV")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="pickled model to score with")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="rows per chunk")
+    parser.add_argument("--workers", type=int, default=1, help="number of scoring processes")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="fraud score above which a row is flagged (default: the app's stored threshold)")
+    args = parser.parse_args()
+
+    threshold = stored_threshold() if args.threshold is None else args.threshold
+    print(f"Fraud threshold: {threshold}")
+    run(args.input, args.output, args.model, args.chunksize, args.workers, threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+# ----------------------------------------
+# MODEL SCORERS
+# ----------------------------------------
+# Common interface over every model trained in training.py. Tree ensembles
+# (RandomForest, ExtraTrees, DecisionTree, XGBoost) are flattened into plain
+# NumPy node arrays and traversed for all trees at once, which avoids the
+# per-call overhead of sklearn/xgboost on small (single-row) inputs. Binary
+# SVCs (optionally behind a StandardScaler, like model/payments.pkl) become
+# plain kernel arithmetic on their support vectors. Anything else is wrapped
+# as-is.
+#
+# Every scorer produces a raw score in one vectorized call (decision_function
+# margin, boosted margin or averaged leaf probability). A Calibration fitted
+# in training.py turns it into a fraud probability, and labels come from
+# comparing that probability with a threshold.
+#
+# Converted scorers can be saved as raw .npy arrays and memory-mapped back
+# (see MEMORY-MAPPED FORMAT below).
+# ----------------------------------------
+import json
+import os
+import pickle
+import shutil
+
+import numpy as np
+
+
+class Calibration:
+    # Maps a model's raw score to a fraud probability. "platt" is the logistic
+    # fit from training.py, sigmoid(a * raw + b); "none" passes raw through.
+    def __init__(self, method="platt", a=1.0, b=0.0):
+        self.method = method
+        self.a = float(a)
+        self.b = float(b)
+
+    @classmethod
+    def identity(cls):
+        return cls("none")
+
+    def apply(self, raw):
+        if self.method == "none":
+            return raw
+        return 1.0 / (1.0 + np.exp(-(self.a * raw + self.b)))
+
+    def to_dict(self):
+        return {"method": self.method, "a": self.a, "b": self.b}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["method"], data.get("a", 1.0), data.get("b", 0.0))
+
+
+class Scorer:
+    # raw_score() is the one model call; fraud_probability() and predict() only
+    # add elementwise work on its output
+    name = "model"
+    classes = (0, 1)
+    raw_kind = "probability"  # or "margin" (unbounded decision score)
+    calibration = None
+
+    def raw_score(self, X):
+        raise NotImplementedError
+
+    def calibrate(self, raw):
+        calibration = self.calibration
+        if calibration is None:
+            # Uncalibrated: sigmoid(0) = 0.5 keeps the model's own decision boundary
+            calibration = Calibration() if self.raw_kind == "margin" else Calibration.identity()
+        return calibration.apply(raw)
+
+    def fraud_probability(self, X):
+        return self.calibrate(self.raw_score(X))
+
+    def predict(self, X, threshold=0.5):
+        return np.asarray(self.classes)[(self.fraud_probability(X) > threshold).astype(np.intp)]
+
+
+class SklearnScorer(Scorer):
+    def __init__(self, model):
+        self.model = model
+        self.name = type(model).__name__
+        self.classes = getattr(model, "classes_", Scorer.classes)
+        if hasattr(model, "decision_function"):
+            self._raw = model.decision_function
+            self.raw_kind = "margin"
+        elif hasattr(model, "predict_proba"):
+            self._raw = lambda X: model.predict_proba(X)[:, 1]
+        else:
+            # Labels only: 0/1 "probabilities"
+            self._raw = model.predict
+
+    def raw_score(self, X):
+        return np.asarray(self._raw(np.asarray(X, dtype=np.float64)), dtype=np.float64)
+
+
+class FlatTreeEnsemble(Scorer):
+    # All trees share one set of node arrays. Leaves point to themselves so the
+    # traversal can run a fixed number of steps (the maximum depth).
+    #   feature[i], threshold[i]: split, go left when x[feature] <= threshold
+    #   left[i], right[i]: global child indices
+    #   value[i]: leaf output (class-1 probability or additive margin)
+    #   roots[t]: root node of tree t
+    ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth,
+                 classes=(0, 1), average=True, base_margin=0.0, name="trees"):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.depth = int(depth)
+        self.classes = np.asarray(classes)
+        self.average = average
+        self.base_margin = float(base_margin)
+        self.raw_kind = "probability" if average else "margin"
+        self.name = name
+
+    def params(self):
+        return {"depth": self.depth, "classes": self.classes.tolist(), "average": self.average,
+                "base_margin": self.base_margin, "name": self.name}
+
+    # ---- construction ----
+
+    @classmethod
+    def from_sklearn(cls, model):
+        estimators = getattr(model, "estimators_", [model])
+        if len(model.classes_) != 2:
+            raise ValueError("Only binary classifiers can be flattened")
+
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        depth = 0
+        offset = 0
+        for est in estimators:
+            tree = est.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left == -1
+            own = np.arange(offset, offset + n)
+            counts = tree.value[:, 0, :]
+            totals = counts.sum(axis=1)
+            totals[totals == 0] = 1.0
+
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, 0.0, tree.threshold))
+            left.append(np.where(is_leaf, own, tree.children_left + offset))
+            right.append(np.where(is_leaf, own, tree.children_right + offset))
+            value.append(counts[:, 1] / totals)
+            roots.append(offset)
+            depth = max(depth, tree.max_depth)
+            offset += n
+
+        return cls(np.concatenate(feature), np.concatenate(threshold),
+                   np.concatenate(left), np.concatenate(right),
+                   np.concatenate(value), roots, depth,
+                   classes=model.classes_, average=True, name=type(model).__name__)
+
+    @classmethod
+    def from_xgboost(cls, model):
+        booster = model.get_booster()
+        names = booster.feature_names
+        index = {name: i for i, name in enumerate(names)} if names else {}
+        config = json.loads(booster.save_config())
+        base_score = config["learner"]["learner_model_param"]["base_score"]
+        base_score = float(str(base_score).strip("[]"))
+        base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        depth = 0
+        for dump in booster.get_dump(dump_format="json"):
+            tree = json.loads(dump)
+            offset = len(feature)
+            roots.append(offset)
+            # Assign global ids breadth-first, then fill arrays
+            ids = {}
+            order = [(tree, 0)]
+            for node, d in order:
+                ids[node["nodeid"]] = offset + len(ids)
+                depth = max(depth, d)
+                for child in node.get("children", []):
+                    order.append((child, d + 1))
+            slots = len(ids)
+            feature.extend([0] * slots)
+            threshold.extend([0.0] * slots)
+            left.extend([0] * slots)
+            right.extend([0] * slots)
+            value.extend([0.0] * slots)
+            for node, _ in order:
+                i = ids[node["nodeid"]]
+                if "leaf" in node:
+                    left[i] = right[i] = i
+                    value[i] = node["leaf"]
+                    continue
+                split = node["split"]
+                feature[i] = index[split] if split in index else int(split.lstrip("f"))
+                # xgboost goes left on x < t (in float32); convert to x <= t'
+                t = np.float32(node["split_condition"])
+                threshold[i] = float(np.nextafter(t, np.float32(-np.inf)))
+                left[i] = ids[node["yes"]]
+                right[i] = ids[node["no"]]
+
+        return cls(feature, threshold, left, right, value, roots, depth,
+                   classes=model.classes_, average=False, base_margin=base_margin,
+                   name=type(model).__name__)
+
+    # ---- inference ----
+
+    def _leaf_values(self, X):
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes]
+
+    def raw_score(self, X):
+        # Averaged leaf probabilities (forests) or summed margin (boosting)
+        leaves = self._leaf_values(X)
+        if self.average:
+            return leaves.mean(axis=1)
+        return leaves.sum(axis=1) + self.base_margin
+
+
+class KernelSVM(Scorer):
+    # decision(x) = sum_i dual_coef[i] * K(support_vectors[i], (x - mean) / scale) + intercept,
+    # the same margin as SVC.decision_function
+    ARRAYS = ("mean", "scale", "support_vectors", "dual_coef")
+    raw_kind = "margin"
+
+    def __init__(self, mean, scale, support_vectors, dual_coef, intercept, kernel="rbf", gamma=1.0,
+                 coef0=0.0, degree=3, classes=(0, 1), name="SVC"):
+        self.mean = np.ascontiguousarray(mean, dtype=np.float64)
+        self.scale = np.ascontiguousarray(scale, dtype=np.float64)
+        self.support_vectors = np.ascontiguousarray(support_vectors, dtype=np.float64)
+        self.dual_coef = np.ascontiguousarray(dual_coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.kernel = kernel
+        self.gamma = float(gamma)
+        self.coef0 = float(coef0)
+        self.degree = int(degree)
+        self.classes = np.asarray(classes)
+        self.name = name
+        self._sv_norms = (self.support_vectors ** 2).sum(axis=1)
+
+    def params(self):
+        return {"intercept": self.intercept, "kernel": self.kernel, "gamma": self.gamma, "coef0": self.coef0,
+                "degree": self.degree, "classes": self.classes.tolist(), "name": self.name}
+
+    @classmethod
+    def from_sklearn(cls, model):
+        # Pipeline([StandardScaler, SVC]) or a bare SVC; None for anything else
+        steps = [step for _, step in model.steps] if type(model).__name__ == "Pipeline" else [model]
+        scaler, svc = (steps if len(steps) == 2 else [None] + steps)[-2:]
+        if (type(svc).__name__ != "SVC" or len(svc.classes_) != 2 or svc.kernel not in KERNELS
+                or getattr(svc, "_sparse", False) or len(steps) > 2
+                or (scaler is not None and type(scaler).__name__ != "StandardScaler")):
+            return None
+        n_features = svc.support_vectors_.shape[1]
+        mean = np.zeros(n_features)
+        scale = np.ones(n_features)
+        if scaler is not None:
+            if scaler.mean_ is not None:
+                mean = scaler.mean_
+            if scaler.scale_ is not None:
+                scale = scaler.scale_
+        return cls(mean, scale, svc.support_vectors_, svc.dual_coef_[0], svc.intercept_[0],
+                   kernel=svc.kernel, gamma=svc._gamma, coef0=svc.coef0, degree=svc.degree,
+                   classes=svc.classes_, name=type(model).__name__)
+
+    def raw_score(self, X):
+        X = (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+        if X.ndim == 1:
+            X = X[None, :]
+        dot = X @ self.support_vectors.T
+        if self.kernel == "linear":
+            kernel = dot
+        elif self.kernel == "rbf":
+            distances = (X ** 2).sum(axis=1)[:, None] + self._sv_norms[None, :] - 2.0 * dot
+            kernel = np.exp(-self.gamma * np.maximum(distances, 0.0))
+        elif self.kernel == "poly":
+            kernel = (self.gamma * dot + self.coef0) ** self.degree
+        else:
+            kernel = np.tanh(self.gamma * dot + self.coef0)
+        return kernel @ self.dual_coef + self.intercept
+
+
+KERNELS = ("linear", "rbf", "poly", "sigmoid")
+
+
+# ----------------------------------------
+# LOADING
+# ----------------------------------------
+def make_scorer(model, calibration=None):
+    kind = type(model).__name__
+    scorer = None
+    if kind in ("RandomForestClassifier", "ExtraTreesClassifier", "DecisionTreeClassifier"):
+        scorer = FlatTreeEnsemble.from_sklearn(model)
+    elif kind == "XGBClassifier":
+        scorer = FlatTreeEnsemble.from_xgboost(model)
+    elif kind in ("Pipeline", "SVC"):
+        scorer = KernelSVM.from_sklearn(model)
+    if scorer is None:
+        scorer = SklearnScorer(model)
+    scorer.calibration = calibration
+    return scorer
+
+
+def calibration_path(model_path):
+    # model/payments.pkl -> model/payments.calibration.json
+    return os.path.splitext(model_path)[0] + ".calibration.json"
+
+
+def load_calibration(model_path):
+    path = calibration_path(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return Calibration.from_dict(json.load(f))
+
+
+def save_calibration(calibration, model_path):
+    with open(calibration_path(model_path), "w") as f:
+        json.dump(calibration.to_dict(), f, indent=2)
+
+
+def load_scorer(path):
+    with open(path, "rb") as f:
+        return make_scorer(pickle.load(f), load_calibration(path))
+
+
+# ----------------------------------------
+# MEMORY-MAPPED FORMAT
+# ----------------------------------------
+# A directory with one .npy file per array of a converted scorer and a
+# scorer.json describing it. Loading maps the arrays read-only instead of
+# unpickling, so the worker processes of one server share a single copy
+# through the OS page cache, and sklearn/xgboost are never imported. Models
+# that can't be converted are stored with joblib, which memory-maps their
+# numpy arrays too. "source" identifies the pickle the directory was built
+# from, so a stale directory is rebuilt rather than served.
+SCORER_FILE = "scorer.json"
+ARRAY_SCORERS = {cls.__name__: cls for cls in (FlatTreeEnsemble, KernelSVM)}
+
+
+def save_mmap(scorer, directory, source):
+    tmp_path = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    if type(scorer).__name__ in ARRAY_SCORERS:
+        for name in scorer.ARRAYS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(scorer, name))
+        spec = {"kind": type(scorer).__name__, "params": scorer.params()}
+    else:
+        import joblib
+        joblib.dump(scorer.model, os.path.join(tmp_path, "model.joblib"))
+        spec = {"kind": "joblib"}
+    spec["source"] = source
+    with open(os.path.join(tmp_path, SCORER_FILE), "w") as f:
+        json.dump(spec, f, indent=2)
+
+    # Another process may be converting the same model; the first rename wins
+    shutil.rmtree(directory, ignore_errors=True)
+    try:
+        os.rename(tmp_path, directory)
+    except OSError:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def load_mmap(directory, source):
+    # The scorer saved in directory, or None if there is none for this source
+    try:
+        with open(os.path.join(directory, SCORER_FILE)) as f:
+            spec = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if spec.get("source") != source:
+        return None
+    if spec["kind"] == "joblib":
+        import joblib
+        return SklearnScorer(joblib.load(os.path.join(directory, "model.joblib"), mmap_mode="r"))
+    cls = ARRAY_SCORERS[spec["kind"]]
+    arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in cls.ARRAYS}
+    return cls(**arrays, **spec["params"])
+
+
+def file_source(path):
+    # Cheap identity of a plain pickle file (hashing a large model on every start would not be)
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def mmap_path(model_path):
+    # model/payments.pkl -> model/payments.mmap/
+    return os.path.splitext(model_path)[0] + ".mmap"
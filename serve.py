@@ -0,0 +1,46 @@
+# ----------------------------------------
+# PRODUCTION LAUNCHER
+# ----------------------------------------
+# Replaces the Flask debug server (python app.py) in production.
+#
+#   python serve.py                                 # ASGI (uvicorn), see asgi.py
+#   python serve.py --workers 8 --port 8000
+#   python serve.py --mode wsgi --workers 4 --threads 8   # Flask only, on gunicorn
+#
+# Every worker is a separate process with its own model copy, connection pool
+# and caches; they share the SQLite database and the model registry.
+# ----------------------------------------
+import argparse
+import os
+import sys
+
+
+def default_workers():
+    return int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fraud detection web app.")
+    parser.add_argument("--mode", choices=["asgi", "wsgi"], default=os.environ.get("SERVER_MODE", "asgi"),
+                        help="asgi: uvicorn with async JSON endpoints; wsgi: gunicorn with Flask only")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="worker processes (default WEB_CONCURRENCY or the CPU count)")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("WSGI_THREADS", "16")),
+                        help="request threads per worker (wsgi mode)")
+    args = parser.parse_args()
+
+    print(f"Starting {args.mode} server on {args.host}:{args.port} with {args.workers} worker(s)")
+    if args.mode == "asgi":
+        import uvicorn
+        uvicorn.run("asgi:app", host=args.host, port=args.port, workers=args.workers,
+                    log_level="info", access_log=False)
+    else:
+        os.execvp(sys.executable, [sys.executable, "-m", "gunicorn",
+                                   "-w", str(args.workers), "--threads", str(args.threads),
+                                   "-b", f"{args.host}:{args.port}", "app:app"])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,159 +1,537 @@
 # IMPORTING LIBRARIES
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
+from sklearn.model_selection import train_test_split, StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, brier_score_loss
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.svm import SVC
 from sklearn.pipeline import Pipeline
+import xgboost as xgb
 from xgboost import XGBClassifier
-import pickle
-import os
-
-# READ THE DATASET
-
-df = pd.read_csv("data/PS_20174392719_1491204439457_log.csv", nrows=2000)
-
-print("Class Distribution:\n", df['isFraud'].value_counts())
-
-# DATA PREPROCESSING
-
-df = df.drop(['nameOrig', 'nameDest', 'isFlaggedFraud'], axis=1)
-
-le = LabelEncoder()
-df['type'] = le.fit_transform(df['type'])
-
-X = df.drop('isFraud', axis=1)
-y = df['isFraud']
-
-# TRAIN TEST SPLIT (STRATIFIED)
-
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y,
-    test_size=0.2,
-    random_state=42,
-    stratify=y
-)
-
-
-# RANDOM FOREST
-
-rf = RandomForestClassifier(
-    n_estimators=200,
-    class_weight='balanced',
-    random_state=42
-)
-
-rf.fit(X_train, y_train)
-rf_pred = rf.predict(X_test)
-
-print("\n=== Random Forest ===")
-print("Accuracy:", accuracy_score(y_test, rf_pred))
-print(confusion_matrix(y_test, rf_pred))
-print(classification_report(y_test, rf_pred))
-
-
-# DECISION TREE
-
-dt = DecisionTreeClassifier(
-    class_weight='balanced',
-    random_state=42
-)
-
-dt.fit(X_train, y_train)
-dt_pred = dt.predict(X_test)
-
-print("\n=== Decision Tree ===")
-print("Accuracy:", accuracy_score(y_test, dt_pred))
-print(confusion_matrix(y_test, dt_pred))
-print(classification_report(y_test, dt_pred))
-
-
-# EXTRA TREES
-
-et = ExtraTreesClassifier(
-    n_estimators=200,
-    class_weight='balanced',
-    random_state=42
-)
-
-et.fit(X_train, y_train)
-et_pred = et.predict(X_test)
-
-print("\n=== Extra Trees ===")
-print("Accuracy:", accuracy_score(y_test, et_pred))
-print(confusion_matrix(y_test, et_pred))
-print(classification_report(y_test, et_pred))
-
-
-# SUPPORT VECTOR MACHINE (GUIDE STYLE BUT IMPROVED)
-
-svc = Pipeline([
-    ("scaler", StandardScaler()),
-    ("svc", SVC(
-        kernel='rbf',
-        C=2,
-        gamma='scale',
-        class_weight='balanced'
-    ))
-])
-
-svc.fit(X_train, y_train)
-
-svc_train_pred = svc.predict(X_train)
-svc_test_pred = svc.predict(X_test)
-
-print("\n=== Support Vector Machine ===")
-print("Train Accuracy:", accuracy_score(y_train, svc_train_pred))
-print("Test Accuracy:", accuracy_score(y_test, svc_test_pred))
-print(confusion_matrix(y_test, svc_test_pred))
-print(classification_report(y_test, svc_test_pred))
-
-
-# XGBOOST
-
-scale_weight = len(y_train[y_train == 0]) / len(y_train[y_train == 1])
-
-xgb = XGBClassifier(
-    eval_metric='logloss',
-    random_state=42,
-    scale_pos_weight=scale_weight,
-    n_estimators=200,
-    learning_rate=0.1
-)
-
-xgb.fit(X_train, y_train)
-xgb_pred = xgb.predict(X_test)
-
-print("\n=== XGBoost ===")
-print("Accuracy:", accuracy_score(y_test, xgb_pred))
-print(confusion_matrix(y_test, xgb_pred))
-print(classification_report(y_test, xgb_pred))
-
-
-# CROSS VALIDATION (LIKE GUIDE)
-
-print("\n=== Cross Validation (5 Fold) ===")
-
-models = {
-    "RandomForest": rf,
-    "DecisionTree": dt,
-    "ExtraTrees": et,
-    "SVC": svc,
-    "XGBoost": xgb
+import registry
+from features import FEATURES_FILE, FEATURE_VERSION, RAW_COLUMNS, TRANSACTION_TYPES, FeatureTransformer, save_for_model
+from scorers import Calibration, make_scorer, save_calibration
+
+DATA_PATH = "data/PS_20174392719_1491204439457_log.csv"
+CACHE_DIR = "cache"
+LEADERBOARD_PATH = "model/leaderboard.json"
+CV_FOLDS = 5
+# Bump when run_job's result fields change, so stale cached results are refit
+RESULTS_FORMAT = 2
+
+
+# READ THE DATASET (CACHED)
+# The preprocessed feature matrix is stored as .npy files keyed by a hash of
+# the source CSV and row limit, and memory-mapped by every worker.
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def load_features(path, nrows):
+    key = f"{file_hash(path)[:16]}-{nrows or 'all'}-f{FEATURE_VERSION}"
+    cache_path = os.path.join(CACHE_DIR, f"features-{key}")
+
+    if not os.path.exists(os.path.join(cache_path, "meta.json")):
+        df = pd.read_csv(path, nrows=nrows or None)
+
+        print("Class Distribution:\n", df['isFraud'].value_counts())
+
+        # DATA PREPROCESSING (shared with app.py and score.py via features.py)
+
+        transformer = FeatureTransformer.fit(df)
+        X = transformer.transform(df)
+        y = df['isFraud']
+
+        tmp_path = cache_path + ".tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        np.save(os.path.join(tmp_path, "X.npy"), X)
+        np.save(os.path.join(tmp_path, "y.npy"), y.to_numpy(dtype=np.int64))
+        transformer.save(os.path.join(tmp_path, FEATURES_FILE))
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump({"rows": int(len(y))}, f)
+        os.replace(tmp_path, cache_path)
+    else:
+        print(f"Using cached features from {cache_path}")
+
+    transformer = FeatureTransformer.load(os.path.join(cache_path, FEATURES_FILE))
+    return cache_path, key, transformer
+
+
+def open_features(cache_path):
+    X = np.load(os.path.join(cache_path, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(cache_path, "y.npy"), mmap_mode="r")
+    return X, y
+
+
+# CALIBRATION
+# Platt scaling: a one-feature logistic regression from a model's raw score
+# (decision_function margin or uncalibrated probability) to P(fraud), fitted
+# on out-of-fold scores so it never sees a model's own training rows. Only the
+# training split's scores are used; the holdout rows are kept for the Brier score.
+
+def fit_calibration(raw, y, sample_weight=None):
+    lr = LogisticRegression(C=1e6)
+    lr.fit(np.asarray(raw).reshape(-1, 1), y, sample_weight=sample_weight)
+    return Calibration("platt", lr.coef_[0][0], lr.intercept_[0])
+
+
+# MODELS
+
+def make_models(scale_weight):
+    return {
+        # RANDOM FOREST
+        "RandomForest": RandomForestClassifier(
+            n_estimators=200,
+            class_weight='balanced',
+            random_state=42
+        ),
+        # DECISION TREE
+        "DecisionTree": DecisionTreeClassifier(
+            class_weight='balanced',
+            random_state=42
+        ),
+        # EXTRA TREES
+        "ExtraTrees": ExtraTreesClassifier(
+            n_estimators=200,
+            class_weight='balanced',
+            random_state=42
+        ),
+        # SUPPORT VECTOR MACHINE (GUIDE STYLE BUT IMPROVED)
+        "SVC": Pipeline([
+            ("scaler", StandardScaler()),
+            ("svc", SVC(
+                kernel='rbf',
+                C=2,
+                gamma='scale',
+                class_weight='balanced'
+            ))
+        ]),
+        # XGBOOST
+        "XGBoost": XGBClassifier(
+            eval_metric='logloss',
+            random_state=42,
+            scale_pos_weight=scale_weight,
+            n_estimators=200,
+            learning_rate=0.1
+        ),
+    }
+
+
+def params_hash(model):
+    return hashlib.sha256(repr(sorted(model.get_params().items())).encode()).hexdigest()[:12]
+
+
+# JOBS
+# Every (model, split) pair is an independent fit. "holdout" is the stratified
+# 80/20 train/test split; "fold-k" are the cross-validation folds. Results are
+# cached per model parameters, so re-runs only fit what changed.
+
+def run_job(cache_path, name, model, split, train_idx, test_idx):
+    X, y = open_features(cache_path)
+    start = time.time()
+    model.fit(X[train_idx], y[train_idx])
+    fit_seconds = time.time() - start
+
+    test_pred = model.predict(X[test_idx])
+    result = {
+        "model": name,
+        "split": split,
+        "accuracy": float(accuracy_score(y[test_idx], test_pred)),
+        "fit_seconds": fit_seconds,
+        # Uncalibrated scores exactly as the serving scorer computes them
+        "test_score": make_scorer(model).raw_score(X[test_idx]).tolist(),
+    }
+    if split == "holdout":
+        result["test_pred"] = test_pred.tolist()
+        result["train_accuracy"] = float(accuracy_score(y[train_idx], model.predict(X[train_idx])))
+        result["model_bytes"] = pickle.dumps(model)
+    return result
+
+
+def job_cache_file(cache_path, name, model, split):
+    return os.path.join(cache_path, "results", f"{name}-{params_hash(model)}-{split}-r{RESULTS_FORMAT}.pkl")
+
+
+def run_all(cache_path, models, splits, workers):
+    results = {}
+    pending = {}
+    os.makedirs(os.path.join(cache_path, "results"), exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for name, model in models.items():
+            for split, (train_idx, test_idx) in splits.items():
+                path = job_cache_file(cache_path, name, model, split)
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        results[(name, split)] = pickle.load(f)
+                    continue
+                future = pool.submit(run_job, cache_path, name, model, split, train_idx, test_idx)
+                pending[future] = (name, split, path)
+
+        print(f"{len(results)} fits reused from cache, {len(pending)} to run on {workers} workers")
+
+        for future, (name, split, path) in pending.items():
+            result = future.result()
+            with open(path, "wb") as f:
+                pickle.dump(result, f)
+            results[(name, split)] = result
+            print(f"  {name} [{split}] accuracy={result['accuracy']:.4f} ({result['fit_seconds']:.1f}s)")
+
+    return results
+
+
+# OUT-OF-CORE TRAINING
+# --out-of-core trains on the whole PaySim log without ever loading it. Each
+# pass streams the CSV in chunks with downcast dtypes:
+#   1. scan: class counts and StandardScaler.partial_fit. 20% of rows are held
+#      out, drawn per row from an RNG seeded with the chunk number, so every
+#      pass sees the same split.
+#   2. XGBoost from a DMatrix iterator (on-disk pages where xgboost supports
+#      it). It trains on every fraud and a random sample of non-frauds. The
+#      sample rate keeps the total under --max-rows, and sampled rows get
+#      weight 1/rate, so the model still sees the true class balance.
+#   3. SGD logistic regression, partial_fit on every training row.
+#   4. calibration: Platt scaling fitted on half of the holdout (every fraud,
+#      weighted sample of non-frauds, as in pass 2).
+#   5. evaluation: the other half of the holdout, scored with the calibrated
+#      probability. Accuracy and the confusion matrix use --threshold (the
+#      app's fraud threshold); the Brier score is exact over every row.
+#      Models are never evaluated on the rows their calibration was fitted on.
+# Peak memory depends on --chunksize and --max-rows, not on the file size. The
+# RBF SVC is not incremental (and is quadratic in rows), so it is only trained
+# in the default in-memory mode.
+
+CSV_DTYPES = {
+    "step": np.int32,
+    "type": pd.CategoricalDtype(TRANSACTION_TYPES),
+    "amount": np.float32,
+    "oldbalanceOrg": np.float32,
+    "newbalanceOrig": np.float32,
+    "oldbalanceDest": np.float32,
+    "newbalanceDest": np.float32,
+    "isFraud": np.int8,
 }
-
-for name, model in models.items():
-    scores = cross_val_score(model, X, y, cv=5)
-    print(f"{name} CV Accuracy: {scores.mean():.4f}")
-
-
-# SAVE SVC
-
-os.makedirs("model", exist_ok=True)
-pickle.dump(svc, open("model/payments.pkl", "wb"))
-
-
-print("\nModel Saved Successfully!")
+HOLDOUT_FRACTION = 0.2
+STREAM_SEED = 42
+# Row roles in the stream; half of the holdout each for calibration and evaluation
+TRAIN, CALIBRATION, EVALUATION = 0, 1, 2
+
+
+def stream_chunks(path, chunksize, transformer, nrows=None):
+    # (X, y, part (TRAIN / CALIBRATION / EVALUATION), uniform draws for negative sampling) per chunk
+    reader = pd.read_csv(path, usecols=list(CSV_DTYPES), dtype=CSV_DTYPES, chunksize=chunksize,
+                         nrows=nrows or None)
+    for index, chunk in enumerate(reader):
+        rng = np.random.default_rng([STREAM_SEED, index])
+        split = rng.random(len(chunk))
+        part = np.where(split >= HOLDOUT_FRACTION, TRAIN,
+                        np.where(split < HOLDOUT_FRACTION / 2, CALIBRATION, EVALUATION))
+        draws = rng.random(len(chunk))
+        X = transformer.transform(chunk[RAW_COLUMNS]).astype(np.float32)
+        yield X, chunk["isFraud"].to_numpy(), part, draws
+
+
+def sample_weights(y, draws, rate):
+    # All frauds (weight 1); non-frauds kept with probability rate (weight 1 / rate)
+    keep = (y == 1) | (draws < rate)
+    return keep, np.where(y[keep] == 1, 1.0, 1.0 / rate)
+
+
+class SampledChunks(xgb.DataIter):
+    # Training rows for XGBoost, re-read from the CSV whenever xgboost resets the iterator
+    def __init__(self, stream, rate, cache_prefix):
+        super().__init__(cache_prefix=cache_prefix)
+        self.stream = stream
+        self.rate = rate
+        self._chunks = None
+
+    def reset(self):
+        self._chunks = None
+
+    def next(self, input_data):
+        if self._chunks is None:
+            self._chunks = self.stream()
+        for X, y, part, draws in self._chunks:
+            train = part == TRAIN
+            keep, weight = sample_weights(y[train], draws[train], self.rate)
+            if keep.any():
+                input_data(data=X[train][keep], label=y[train][keep], weight=weight)
+                return True
+        return False
+
+
+def train_xgboost_streaming(model, stream, rate):
+    # Same parameters as the in-memory XGBClassifier, trained from the iterator
+    params = {k: v for k, v in model.get_xgb_params().items() if v is not None}
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    chunks = SampledChunks(stream, rate, os.path.join(CACHE_DIR, "xgboost-pages"))
+    if hasattr(xgb, "ExtMemQuantileDMatrix"):
+        dtrain = xgb.ExtMemQuantileDMatrix(chunks)
+    else:
+        dtrain = xgb.QuantileDMatrix(chunks)
+    booster = xgb.train(params, dtrain, num_boost_round=model.n_estimators)
+    model.load_model(bytearray(booster.save_raw(raw_format="ubj")))
+    return model
+
+
+def train_sgd_streaming(stream, scaler, class_weight, epochs):
+    sgd = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)
+    for _ in range(epochs):
+        for X, y, part, _ in stream():
+            train = part == TRAIN
+            sgd.partial_fit(scaler.transform(X[train]), y[train], classes=[0, 1],
+                            sample_weight=class_weight[y[train]])
+    return Pipeline([("scaler", scaler), ("sgd", sgd)])
+
+
+def train_out_of_core(args):
+    transformer = FeatureTransformer(TRANSACTION_TYPES)
+    stream = lambda: stream_chunks(args.data, args.chunksize, transformer, args.nrows)
+
+    # PASS 1: COUNTS AND SCALER
+
+    start = time.time()
+    counts = np.zeros(2, dtype=np.int64)
+    holdout_rows = 0
+    scaler = StandardScaler()
+    for X, y, part, _ in stream():
+        train = part == TRAIN
+        counts += np.bincount(y[train], minlength=2)
+        holdout_rows += int((~train).sum())
+        scaler.partial_fit(X[train])
+    rate = min(1.0, max(args.max_rows - counts[1], 1) / max(counts[0], 1))
+    print(f"Scanned {counts.sum() + holdout_rows:,} rows in {time.time() - start:.1f}s: "
+          f"{counts[1]:,} fraud / {counts[0]:,} legitimate for training, {holdout_rows:,} held out")
+    print(f"Non-fraud sample rate for XGBoost: {rate:.4f}")
+
+    # PASSES 2-3: FIT
+
+    scale_weight = counts[0] / max(counts[1], 1)
+    fitted, fit_seconds = {}, {}
+    start = time.time()
+    fitted["XGBoost"] = train_xgboost_streaming(make_models(scale_weight)["XGBoost"], stream, rate)
+    fit_seconds["XGBoost"] = time.time() - start
+    start = time.time()
+    class_weight = counts.sum() / (2.0 * np.maximum(counts, 1))
+    fitted["SGD"] = train_sgd_streaming(stream, scaler, class_weight, args.epochs)
+    fit_seconds["SGD"] = time.time() - start
+
+    # PASS 4: CALIBRATION
+
+    scorers = {name: make_scorer(model) for name, model in fitted.items()}
+    sample_raw = {name: [] for name in fitted}
+    sample_y, sample_w = [], []
+    for X, y, part, draws in stream():
+        calibration = part == CALIBRATION
+        keep, weight = sample_weights(y[calibration], draws[calibration], rate)
+        sample_y.append(y[calibration][keep])
+        sample_w.append(weight)
+        for name, scorer in scorers.items():
+            sample_raw[name].append(scorer.raw_score(X[calibration][keep]))
+    sample_y, sample_w = np.concatenate(sample_y), np.concatenate(sample_w)
+
+    calibrations = {}
+    for name, scorer in scorers.items():
+        calibrations[name] = fit_calibration(np.concatenate(sample_raw[name]), sample_y, sample_w)
+        scorer.calibration = calibrations[name]
+
+    # PASS 5: EVALUATION
+
+    confusion = {name: np.zeros((2, 2), dtype=np.int64) for name in fitted}
+    squared_error = dict.fromkeys(fitted, 0.0)
+    for X, y, part, _ in stream():
+        evaluation = part == EVALUATION
+        X, y = X[evaluation], y[evaluation]
+        for name, scorer in scorers.items():
+            probability = scorer.fraud_probability(X)
+            np.add.at(confusion[name], (y, (probability > args.threshold).astype(np.int64)), 1)
+            squared_error[name] += float(np.sum((probability - y) ** 2))
+
+    # REPORTS
+
+    leaderboard = []
+    for name in fitted:
+        evaluated = max(confusion[name].sum(), 1)
+        brier = squared_error[name] / evaluated
+        accuracy = float(np.trace(confusion[name]) / evaluated)
+
+        print(f"\n=== {name} ===")
+        print(f"Accuracy (threshold {args.threshold}):", accuracy)
+        print(confusion[name])
+        print("Calibrated Brier Score:", brier)
+        leaderboard.append({
+            "model": name,
+            "test_accuracy": accuracy,
+            "brier_score": brier,
+            "fit_seconds": fit_seconds[name],
+        })
+    leaderboard.sort(key=lambda row: row["brier_score"])
+
+    os.makedirs("model", exist_ok=True)
+    with open(LEADERBOARD_PATH, "w") as f:
+        json.dump({"dataset": os.path.basename(args.data), "mode": "out-of-core",
+                   "rows": int(counts.sum() + holdout_rows), "negative_sample_rate": rate,
+                   "threshold": args.threshold,
+                   "models": leaderboard}, f, indent=2)
+    print(f"Leaderboard written to {LEADERBOARD_PATH}")
+
+    # SAVE ALL MODELS AND PUBLISH THE BEST CALIBRATED ONE
+
+    for name, model in fitted.items():
+        pickle.dump(model, open(f"model/{name.lower()}.pkl", "wb"))
+        save_calibration(calibrations[name], f"model/{name.lower()}.pkl")
+        save_for_model(transformer, f"model/{name.lower()}.pkl")
+
+    best = leaderboard[0]
+    version = registry.publish(
+        fitted[best["model"]], best["model"],
+        transformer,
+        metrics={"test_accuracy": best["test_accuracy"], "brier_score": best["brier_score"]},
+        calibration=calibrations[best["model"]]
+    )
+    print(f"Published {best['model']} as model version:", version)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and compare the fraud detection models.")
+    parser.add_argument("--data", default=DATA_PATH, help="PaySim CSV")
+    parser.add_argument("--nrows", type=int, default=None,
+                        help="rows to read (0 = whole file; default 2000, or all with --out-of-core)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="parallel fit processes")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="stream the CSV in chunks and train incrementally (XGBoost, SGD)")
+    parser.add_argument("--chunksize", type=int, default=500000, help="rows per chunk (out-of-core)")
+    parser.add_argument("--max-rows", type=int, default=1000000,
+                        help="most training rows held at once, via non-fraud sampling (out-of-core)")
+    parser.add_argument("--epochs", type=int, default=1, help="SGD passes over the data (out-of-core)")
+    parser.add_argument("--threshold", type=float, default=float(os.environ.get("FRAUD_THRESHOLD", "0.5")),
+                        help="fraud score above which a holdout row counts as flagged (out-of-core)")
+    args = parser.parse_args()
+
+    if args.out_of_core:
+        return train_out_of_core(args)
+    if args.nrows is None:
+        args.nrows = 2000
+
+    cache_path, key, transformer = load_features(args.data, args.nrows)
+    X, y = open_features(cache_path)
+
+    # TRAIN TEST SPLIT (STRATIFIED)
+
+    indices = np.arange(len(y))
+    train_idx, test_idx = train_test_split(
+        indices,
+        test_size=0.2,
+        random_state=42,
+        stratify=y
+    )
+    y_train, y_test = y[train_idx], y[test_idx]
+
+    # Same folds as cross_val_score(model, X, y, cv=5)
+    splits = {"holdout": (train_idx, test_idx)}
+    for k, (fold_train, fold_test) in enumerate(StratifiedKFold(CV_FOLDS).split(indices, y)):
+        splits[f"fold-{k}"] = (fold_train, fold_test)
+
+    scale_weight = len(y_train[y_train == 0]) / len(y_train[y_train == 1])
+    models = make_models(scale_weight)
+
+    results = run_all(cache_path, models, splits, args.workers)
+
+    # REPORTS
+
+    fitted = {}
+    calibrations = {}
+    leaderboard = []
+    for name in models:
+        holdout = results[(name, "holdout")]
+        fitted[name] = pickle.loads(holdout["model_bytes"])
+        test_pred = np.asarray(holdout["test_pred"])
+
+        out_of_fold = np.empty(len(y))
+        for k in range(CV_FOLDS):
+            out_of_fold[splits[f"fold-{k}"][1]] = results[(name, f"fold-{k}")]["test_score"]
+        calibrations[name] = fit_calibration(out_of_fold[train_idx], y_train)
+        holdout_probability = calibrations[name].apply(np.asarray(holdout["test_score"]))
+
+        print(f"\n=== {name} ===")
+        if name == "SVC":
+            print("Train Accuracy:", holdout["train_accuracy"])
+            print("Test Accuracy:", holdout["accuracy"])
+        else:
+            print("Accuracy:", holdout["accuracy"])
+        print(confusion_matrix(y_test, test_pred))
+        print(classification_report(y_test, test_pred))
+        print("Calibrated Brier Score:", brier_score_loss(y_test, holdout_probability))
+
+        cv = [results[(name, f"fold-{k}")]["accuracy"] for k in range(CV_FOLDS)]
+        leaderboard.append({
+            "model": name,
+            "test_accuracy": holdout["accuracy"],
+            "cv_accuracy": float(np.mean(cv)),
+            "cv_std": float(np.std(cv)),
+            "brier_score": float(brier_score_loss(y_test, holdout_probability)),
+            "fit_seconds": sum(results[(name, s)]["fit_seconds"] for s in splits),
+        })
+
+    # CROSS VALIDATION (LIKE GUIDE)
+
+    print(f"\n=== Cross Validation ({CV_FOLDS} Fold) ===")
+    leaderboard.sort(key=lambda row: row["cv_accuracy"], reverse=True)
+    for row in leaderboard:
+        print(f"{row['model']} CV Accuracy: {row['cv_accuracy']:.4f}")
+
+    os.makedirs("model", exist_ok=True)
+    with open(LEADERBOARD_PATH, "w") as f:
+        json.dump({"dataset": key, "rows": int(len(y)), "models": leaderboard}, f, indent=2)
+    print(f"Leaderboard written to {LEADERBOARD_PATH}")
+
+    # SAVE SVC
+
+    svc = fitted["SVC"]
+    pickle.dump(svc, open("model/payments.pkl", "wb"))
+    save_calibration(calibrations["SVC"], "model/payments.pkl")
+    save_for_model(transformer, "model/payments.pkl")
+
+    # SAVE ALL MODELS (serve any of them with FRAUD_MODEL_PATH=model/<name>.pkl python app.py)
+
+    for name, model in fitted.items():
+        pickle.dump(model, open(f"model/{name.lower()}.pkl", "wb"))
+        save_calibration(calibrations[name], f"model/{name.lower()}.pkl")
+        save_for_model(transformer, f"model/{name.lower()}.pkl")
+
+    # PUBLISH SVC TO THE MODEL REGISTRY (a running app.py can hot-swap to it)
+
+    cv_scores = {row["model"]: row["cv_accuracy"] for row in leaderboard}
+    version = registry.publish(
+        svc, "SVC",
+        transformer,
+        metrics={
+            "test_accuracy": results[("SVC", "holdout")]["accuracy"],
+            "cv_accuracy": cv_scores["SVC"]
+        },
+        calibration=calibrations["SVC"]
+    )
+    print("Published model version:", version)
+
+    print("\nModel Saved Successfully!")
+
+
+if __name__ == "__main__":
+    main()